@@ -1,5 +1,11 @@
 import streamlit as st
-from supabase_utils import get_user_supabase
+import pandas as pd
+from supabase_utils import get_supabase_bucket
+from utils.blob_cache import get_blob_cache
+from utils.frame_cache import get_frame_cache
+from utils.driver_factory import driver_stats
+from utils.scrape_jobs import get_scrape_jobs
+from utils.scraping_utils import chrome_pool
 import yaml
 
 def admin_tab(admin_username: str):
@@ -26,8 +32,7 @@ def admin_tab(admin_username: str):
 
         
         # Also try to get users from Supabase for comparison
-        user_supabase = get_user_supabase()
-        bucket = user_supabase.storage.from_("data")
+        bucket = get_supabase_bucket()
         
         try:
             all_items = bucket.list(path="")
@@ -94,4 +99,35 @@ def admin_tab(admin_username: str):
             st.error("No users found. Please check your configuration.")
             
     except Exception as e:
-        st.error(f"Error accessing user list: {e}") 
\ No newline at end of file
+        st.error(f"Error accessing user list: {e}") 
+
+def storage_diagnostics_panel(storage_stats):
+    """
+    Show storage call counts and timings for this rerun and session, plus scraper browser and import stats (admins only)
+    
+    Args:
+        storage_stats: The session's StorageStats
+    """
+    with st.expander("Storage diagnostics"):
+        calls = storage_stats.current_rerun()
+        total_ms = sum(call["ms"] for call in calls)
+        total_kb = sum(call["bytes"] for call in calls) / 1024
+        st.markdown(f"**This rerun:** {len(calls)} calls, {total_kb:.1f} KB, {total_ms:.0f} ms")
+        if calls:
+            st.dataframe(pd.DataFrame(calls)[["tab", "op", "path", "bytes", "ms", "ok"]], hide_index=True)
+        st.markdown("**This session, by tab:**")
+        totals = storage_stats.session_totals()
+        if totals:
+            st.dataframe(pd.DataFrame(totals), hide_index=True)
+        st.markdown("**Recent reruns:**")
+        st.dataframe(pd.DataFrame(storage_stats.recent_reruns()), hide_index=True)
+        st.markdown("**Caches:**")
+        st.dataframe(pd.DataFrame([
+            {"cache": "blob", **get_blob_cache().stats()},
+            {"cache": "frame", **get_frame_cache().stats()},
+        ]), hide_index=True)
+        st.markdown("**Scraper browsers:**")
+        st.dataframe(pd.DataFrame([{"pool": "browsers", **chrome_pool().stats()}]), hide_index=True)
+        st.dataframe(pd.DataFrame([driver_stats()]), hide_index=True)
+        st.markdown("**Background imports:**")
+        st.dataframe(pd.DataFrame([get_scrape_jobs().stats() or {"jobs": 0}]), hide_index=True)
@@ -1,14 +1,9 @@
 import streamlit as st
 import pandas as pd
-import io
-import time
-from supabase_utils import get_user_supabase, build_supabase_path
+from supabase_utils import delete_dataframe, read_dataframe, upsert_dataframe
 
 def biostarks_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
     st.markdown(f"<h1>{timepoint_modifier} Biostarks</h1>", unsafe_allow_html=True)
-    user_supabase = get_user_supabase()
-    biostarks_filename = build_supabase_path(username, timepoint_id, "biostarks.csv")
-    bucket = user_supabase.storage.from_("data")
     
     # Create timepoint-scoped session state keys
     df_key = f"biostarks_df_{timepoint_modifier}"
@@ -18,23 +13,19 @@ def biostarks_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
     
     if df_key not in st.session_state:
         try:
-            biostarks_bytes = bucket.download(biostarks_filename)
-            files = bucket.list(path=f"{username}/{timepoint_modifier}/")
-            in_list = any(f["name"] == "biostarks.csv" for f in files)
-            if biostarks_bytes and len(biostarks_bytes) > 0 and in_list:
-                st.session_state[df_key] = pd.read_csv(io.BytesIO(biostarks_bytes))
+            biostarks_df = read_dataframe(username, timepoint_id, "biostarks.csv")
+            if biostarks_df is not None:
+                st.session_state[df_key] = biostarks_df
             else:
                 st.session_state[df_key] = pd.DataFrame(columns=["Metric", "Value"])
         except Exception:
             st.session_state[df_key] = pd.DataFrame(columns=["Metric", "Value"])
     if st.session_state.get(reset_key, False):
         with st.spinner("Deleting file from database..."):
-            try:
-                bucket.remove([biostarks_filename])
-                st.session_state[deleted_key] = True
-            except Exception as e:
-                st.warning(f"Failed to delete file: {e}")
-                st.session_state[deleted_key] = False
+            result = delete_dataframe(username, timepoint_id, "biostarks.csv")
+            if not result.ok:
+                st.warning(f"Failed to delete file: {result.error}")
+            st.session_state[deleted_key] = result.ok
         for key in [reset_key, submitted_key]:
             st.session_state.pop(key, None)
         st.session_state[df_key] = pd.DataFrame(columns=["Metric", "Value"])
@@ -106,19 +97,12 @@ def biostarks_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
                 ], columns=["Metric", "Value"])
                 with st.spinner("Saving to database..."):
                     st.session_state[df_key] = biostarks_df
-                    biostarks_csv_bytes = biostarks_df.to_csv(index=False).encode()
-                    try:
-                        bucket.remove([biostarks_filename])
-                    except:
-                        pass
-                    bucket.upload(
-                        path=biostarks_filename,
-                        file=biostarks_csv_bytes,
-                        file_options={"content-type": "text/csv"}
-                    )
-                    time.sleep(1)
-                    st.session_state[submitted_key] = True
-                    st.rerun()
+                    result = upsert_dataframe(username, timepoint_id, "biostarks.csv", biostarks_df)
+                    if result.ok:
+                        st.session_state[submitted_key] = True
+                        st.rerun()
+                    else:
+                        st.error(f"Failed to save your values: {result.error}")
     else:
         st.dataframe(st.session_state[df_key])
         st.success("Upload successful!")
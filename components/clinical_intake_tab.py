@@ -1,22 +1,16 @@
 import streamlit as st
-import pandas as pd
-import io
-from supabase_utils import get_user_supabase, build_supabase_path
+from supabase_utils import build_supabase_path, exists, read_dataframe, upsert_file
 from datetime import datetime
 
 def clinical_intake_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
     st.markdown(f"<h1>{timepoint_modifier} Clinical Intake</h1>", unsafe_allow_html=True)
-    user_supabase = get_user_supabase()
-    bucket = user_supabase.storage.from_("data")
     
     # Check if clinical data exists
-    clinical_file = build_supabase_path(username, timepoint_id, "clinical.csv")
     clinical_data_exists = False
     
     try:
-        clinical_bytes = user_supabase.storage.from_("data").download(clinical_file)
-        clinical_df = pd.read_csv(io.BytesIO(clinical_bytes))
-        clinical_data_exists = True
+        clinical_df = read_dataframe(username, timepoint_id, "clinical.csv")
+        clinical_data_exists = clinical_df is not None
     except Exception as e:
         clinical_data_exists = False
     
@@ -25,8 +19,7 @@ def clinical_intake_tab(username, timepoint_id="T_01", timepoint_modifier="T01")
     form_submitted = False
     
     try:
-        bucket.download(submission_file)
-        form_submitted = True
+        form_submitted = exists(submission_file)
     except Exception as e:
         form_submitted = False
     
@@ -67,13 +60,13 @@ def clinical_intake_tab(username, timepoint_id="T_01", timepoint_modifier="T01")
                 timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
                 confirmation_content = f"Clinical intake form completed for {timepoint_modifier} at {timestamp}"
                 
-                try:
-                    bucket.upload(
-                        submission_file,
-                        confirmation_content.encode("utf-8"),
-                        {"content-type": "text/plain"}
-                    )
+                result = upsert_file(
+                    submission_file,
+                    confirmation_content.encode("utf-8"),
+                    "text/plain"
+                )
+                if result.ok:
                     st.success("Thank you! We will retrieve and process your form responses shortly.")
                     st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to submit confirmation: {e}")
+                else:
+                    st.error(f"Failed to submit confirmation: {result.error}")
@@ -1,32 +1,24 @@
 import streamlit as st
-import pandas as pd
-import io
-import time
-from utils.scraping_utils import update_progress, scrape_function_health
-from supabase_utils import get_supabase_bucket, build_supabase_path
+from utils.scraping_utils import scrape_function_health, warm_browsers
+from utils.scrape_jobs import DONE, CANCELLED, get_scrape_jobs
+from supabase_utils import read_dataframe, upsert_dataframe
+from components.scrape_job_panel import current_job, job_owner, release_job, scrape_job_panel
 
 def function_health_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
-    bucket = get_supabase_bucket()
-    
     # Create timepoint-scoped session state keys
     csv_ready_key = f"function_csv_ready_{timepoint_modifier}"
     csv_key = f"function_csv_{timepoint_modifier}"
     df_key = f"function_df_{timepoint_modifier}"
     uploaded_key = f"function_supabase_uploaded_{timepoint_modifier}"
     init_key = f"to_initialize_function_csv_{timepoint_modifier}"
+    job_key = f"function_job_{timepoint_modifier}"
+    function_job_owner = job_owner(username, "function_health", timepoint_modifier)
     
     # === Try to restore saved CSV (stateless ghost-block logic)
     if not st.session_state.get(csv_ready_key):
         try:
-            function_filename = build_supabase_path(username, timepoint_id, "functionhealth.csv")
-            res = bucket.download(function_filename)
-            files = bucket.list(path=f"{username}/{timepoint_modifier}/")
-            in_list = any(f["name"] == "functionhealth.csv" for f in files)
-            if res and len(res) > 0 and not in_list:
-                st.session_state[csv_ready_key] = False
-            elif res and len(res) > 0:
-                function_df = pd.read_csv(io.BytesIO(res))
-                st.session_state[csv_key] = res
+            function_df = read_dataframe(username, timepoint_id, "functionhealth.csv")
+            if function_df is not None:
                 st.session_state[df_key] = function_df
                 st.session_state[csv_ready_key] = True
             else:
@@ -55,6 +47,35 @@ def function_health_tab(username, timepoint_id="T_01", timepoint_modifier="T01")
     <strong>Your Information Stays Private:</strong> We do not store your credentials. They are used to connect to Function Health to download your data, and then are erased from memory.
     </div>""", unsafe_allow_html=True)
         
+        job = current_job(job_key, function_job_owner)
+        if job is not None and not job.finished:
+            # The import runs in the background; poll it until it finishes
+            scrape_job_panel(job.id, job_key)
+            return
+        
+        if job is not None:
+            release_job(job_key, job)
+            if job.state == DONE:
+                with st.spinner("Saving Function Health Data"):
+                    function_df = job.result
+                    function_csv_bytes = function_df.to_csv(index=False).encode()
+                    st.session_state[csv_key] = function_csv_bytes
+                    st.session_state[df_key] = function_df
+                    st.session_state[f"{username}_functionhealth.csv"] = function_csv_bytes
+                    result = upsert_dataframe(username, timepoint_id, "functionhealth.csv", function_df)
+                if not result.ok:
+                    st.error(f"Upload failed: {result.error}")
+                else:
+                    st.session_state[uploaded_key] = True
+                    st.session_state[init_key] = True
+                    st.rerun()
+            elif job.state == CANCELLED:
+                st.info("Import cancelled.")
+            else:
+                st.error(f"Import failed: {type(job.error).__name__} — {job.error}")
+        
+        # Start a browser while the user fills in the form
+        warm_browsers()
         with st.form("function_login_form"):
             user_email = st.text_input("Function Health Email", key="function_email")
             user_pass = st.text_input("Function Health Password", type="password", key="function_password")
@@ -65,47 +86,11 @@ def function_health_tab(username, timepoint_id="T_01", timepoint_modifier="T01")
                 st.error("Please enter email and password.")
                 st.stop()
             st.session_state.pop("skip_restore", None)
-            with st.spinner("Importing Function Health Data"):
-                status = st.empty()
-                try:
-                    function_df = scrape_function_health(user_email, user_pass, status)
-                    status.markdown(
-                        '<div style="margin-left:2.3em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ Deleting Function Health credentials from memory</div>',
-                        unsafe_allow_html=True
-                    )
-                    del user_email
-                    del user_pass
-                    st.session_state.pop("function_email", None)
-                    st.session_state.pop("function_password", None)
-                    function_csv_bytes = function_df.to_csv(index=False).encode()
-                    st.session_state[csv_key] = function_csv_bytes
-                    st.session_state[df_key] = function_df
-                    st.session_state[f"{username}_functionhealth.csv"] = function_csv_bytes
-                    st.session_state[f"{username}_functionhealth.csv"] = function_csv_bytes
-                    function_filename = build_supabase_path(username, timepoint_id, "functionhealth.csv")
-                    try:
-                        bucket.remove([function_filename])
-                    except Exception:
-                        pass
-                    response = bucket.upload(
-                        path=function_filename,
-                        file=function_csv_bytes,
-                        file_options={"content-type": "text/csv"}
-                    )
-                    res_data = response.__dict__
-                    if "error" in res_data and res_data["error"]:
-                        st.error("Upload failed.")
-                    else:
-                        st.session_state[uploaded_key] = True
-                    
-                    status.markdown(
-                        '<div style="margin-left:2.3em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ Import successful!</div>',
-                        unsafe_allow_html=True
-                    )
-                    st.session_state[init_key] = True
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Import failed: {type(e).__name__} — {e}")
-                finally:
-                    status.empty()
+            # Credentials go only to the background job and are dropped from session state
+            job = get_scrape_jobs().submit(function_job_owner, "Importing Function Health Data", scrape_function_health, user_email, user_pass)
+            del user_email
+            del user_pass
+            st.session_state.pop("function_email", None)
+            st.session_state.pop("function_password", None)
+            st.session_state[job_key] = job.id
+            st.rerun()
@@ -1,13 +1,9 @@
 import streamlit as st
 import pandas as pd
-import io
-import time
 from datetime import datetime
-from supabase_utils import get_user_supabase, build_supabase_path
+from supabase_utils import build_supabase_path, read_dataframe, stat, upsert_dataframe
 
 def interventions_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
-    user_supabase = get_user_supabase()
-    
     # Create timepoint-scoped session state keys
     df_key = f"intervention_plan_df_{timepoint_modifier}"
     timestamp_key = f"intervention_plan_timestamp_{timepoint_modifier}"
@@ -17,21 +13,17 @@ def interventions_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
     if df_key not in st.session_state:
         try:
             plan_filename = build_supabase_path(username, timepoint_id, "intervention_plan.csv")
-            bucket = user_supabase.storage.from_("data")
-            # Check files in the timepoint-specific directory, not user root
-            files = bucket.list(path=f"{username}/{timepoint_modifier}/")
-            in_list = any(f["name"] == "intervention_plan.csv" for f in files)
+            # Check metadata in the timepoint-specific directory, not user root
+            matching = stat(plan_filename)
             
-            if in_list:
+            if matching:
                 # Get timestamp from file metadata
-                matching = next((f for f in files if f["name"] == "intervention_plan.csv"), None)
                 if matching and "updated_at" in matching:
                     from dateutil import parser
                     st.session_state[timestamp_key] = parser.parse(matching["updated_at"]).strftime("%B %d, %Y")
                 
-                bytes_data = bucket.download(plan_filename)
-                if isinstance(bytes_data, bytes):
-                    df = pd.read_csv(io.BytesIO(bytes_data))
+                df = read_dataframe(username, timepoint_id, "intervention_plan.csv")
+                if df is not None:
                     st.session_state[df_key] = df
         except Exception:
             pass
@@ -92,17 +84,10 @@ def interventions_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
                 if submitted:
                     plan_df = pd.DataFrame([(k, v) for k, v in plans.items()], columns=["Category", "Plan"])
                     st.session_state[df_key] = plan_df
-                    csv_bytes = plan_df.to_csv(index=False).encode()
-                    plan_filename = build_supabase_path(username, timepoint_id, "intervention_plan.csv")
-                    bucket = user_supabase.storage.from_("data")
-                    try:
-                        bucket.remove([plan_filename])
-                    except:
-                        pass
-                    bucket.upload(
-                        path=plan_filename,
-                        file=csv_bytes,
-                        file_options={"content-type": "text/csv"}
-                    )
-                    st.session_state[timestamp_key] = datetime.utcnow().strftime("%B %d, %Y")
-                    st.rerun() 
+                    result = upsert_dataframe(username, timepoint_id, "intervention_plan.csv", plan_df)
+                    if result.ok:
+                        st.session_state[timestamp_key] = datetime.utcnow().strftime("%B %d, %Y")
+                        st.rerun()
+                    else:
+                        st.session_state.pop(df_key, None)
+                        st.error(f"Failed to save your plan: {result.error}") 
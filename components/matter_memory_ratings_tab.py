@@ -1,22 +1,16 @@
 import streamlit as st
-import pandas as pd
-import io
-from supabase_utils import get_user_supabase, build_supabase_path
+from supabase_utils import build_supabase_path, exists, read_dataframe, upsert_file
 from datetime import datetime
 
 def matter_memory_ratings_tab(username: str, timepoint_id="T_01", timepoint_modifier="T01"):
     st.markdown(f"<h1>{timepoint_modifier} Matter Memory Ratings</h1>", unsafe_allow_html=True)
-    user_supabase = get_user_supabase()
-    bucket = user_supabase.storage.from_("data")
     
     # Check if matter data exists
-    matter_file = build_supabase_path(username, timepoint_id, "matter2.csv")
     matter_data_exists = False
     
     try:
-        matter_bytes = user_supabase.storage.from_("data").download(matter_file)
-        matter_df = pd.read_csv(io.BytesIO(matter_bytes))
-        matter_data_exists = True
+        matter_df = read_dataframe(username, timepoint_id, "matter2.csv")
+        matter_data_exists = matter_df is not None
     except Exception as e:
         matter_data_exists = False
     
@@ -25,8 +19,7 @@ def matter_memory_ratings_tab(username: str, timepoint_id="T_01", timepoint_modi
     form_submitted = False
     
     try:
-        bucket.download(submission_file)
-        form_submitted = True
+        form_submitted = exists(submission_file)
     except Exception as e:
         form_submitted = False
     
@@ -66,13 +59,13 @@ def matter_memory_ratings_tab(username: str, timepoint_id="T_01", timepoint_modi
                 timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
                 confirmation_content = f"Matter memory data uploaded for {timepoint_modifier} at {timestamp}"
                 
-                try:
-                    bucket.upload(
-                        submission_file,
-                        confirmation_content.encode("utf-8"),
-                        {"content-type": "text/plain"}
-                    )
+                result = upsert_file(
+                    submission_file,
+                    confirmation_content.encode("utf-8"),
+                    "text/plain"
+                )
+                if result.ok:
                     st.success("Thank you! We will retrieve and process your memory data shortly.")
                     st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to submit confirmation: {e}") 
+                else:
+                    st.error(f"Failed to submit confirmation: {result.error}") 
@@ -1,16 +1,14 @@
 import streamlit as st
-import pandas as pd
-import io
-from supabase_utils import get_user_supabase, build_supabase_path
+from supabase_utils import read_dataframe
 
 def oprl_tab(username: str, timepoint_id="T_01", timepoint_modifier="T01"):
     st.markdown(f"<h1>{timepoint_modifier} Oregon Performance Research Lab</h1>", unsafe_allow_html=True)
-    user_supabase = get_user_supabase()
-    oprl_file = build_supabase_path(username, timepoint_id, "oprl.csv")
     try:
-        oprl_bytes = user_supabase.storage.from_("data").download(oprl_file)
-        oprl_df = pd.read_csv(io.BytesIO(oprl_bytes))
+        oprl_df = read_dataframe(username, timepoint_id, "oprl.csv")
+    except Exception as e:
+        oprl_df = None
+    if oprl_df is not None:
         st.markdown("Double-click any cell to reveal its full contents.")
         st.dataframe(oprl_df)
-    except Exception as e:
-        st.info("Your OPRL data has not yet been received and/or analyzed. If you believe this is an error, please contact admin.") 
+    else:
+        st.info("Your OPRL data has not yet been received and/or analyzed. If you believe this is an error, please contact admin.")
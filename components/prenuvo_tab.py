@@ -4,8 +4,8 @@ import os
 import time
 import fitz
 from utils.redaction_utils import redact_prenuvo_pdf
-from supabase_utils import get_user_supabase, build_supabase_path
-import io
+from supabase_utils import build_supabase_path, exists, upload_file, upsert_file
+from components.stored_file_download import stored_file_download
 from datetime import datetime
 import streamlit.components.v1 as components
 
@@ -17,22 +17,12 @@ def prenuvo_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
         st.info("No Prenuvo data were collected for Time Point 02.")
         return
     
-    user_supabase = get_user_supabase()
     filename = build_supabase_path(username, timepoint_id, "redacted_prenuvo_report.pdf")
-    bucket = user_supabase.storage.from_("data")
-    file_list = bucket.list(path=f"{username}/{timepoint_modifier}/")
-    file_exists = any(f["name"] == "redacted_prenuvo_report.pdf" for f in file_list)
+    file_exists = exists(filename)
     
     if file_exists:
         st.success("Your report was successfully redacted and saved!")
-        try:
-            pdf_bytes = bucket.download(filename)
-            if isinstance(pdf_bytes, bytes):
-                st.download_button("Download Report", pdf_bytes, file_name="redacted_prenuvo_report.pdf")
-            else:
-                st.error("Failed to retrieve the file. Please try again.")
-        except Exception as e:
-            st.error(f"Error retrieving file: {e}")
+        stored_file_download(filename, "redacted_prenuvo_report.pdf", key=f"prenuvo_download_{timepoint_modifier}")
     elif "redacted_pdf_for_review" in st.session_state:
         file_bytes = st.session_state.redacted_pdf_for_review
         st.markdown("""
@@ -66,12 +56,12 @@ def prenuvo_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
         components.html(scrollable_html, height=670, scrolling=False)
         if st.button("Approve Redaction", key="approve_redaction"):
             with st.spinner("Saving redacted file..."):
-                try:
-                    bucket.upload(filename, file_bytes, {"content-type": "application/pdf"})
+                result = upsert_file(filename, file_bytes, "application/pdf")
+                if result.ok:
                     st.session_state.pop("redacted_pdf_for_review", None)
                     st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to save redacted file: {e}")
+                else:
+                    st.error(f"Failed to save redacted file: {result.error}")
         if st.button("Report an Issue", key="report_issue"):
             st.session_state.show_report_box = True
         if st.button("Start Over", key="start_over_before_approve"):
@@ -81,10 +71,10 @@ def prenuvo_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
             issue = st.text_area("Describe the issue with redaction:")
             if st.button("Submit Issue", key="submit_issue"):
                 timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S-%f")
-                bucket.upload(
+                upload_file(
                     f"{username}/issues/issue_{timestamp}.txt",
                     issue.encode("utf-8"),
-                    {"content-type": "text/plain"}
+                    "text/plain"
                 )
                 st.session_state.issue_submitted = True
                 st.session_state.pop("show_report_box", None)
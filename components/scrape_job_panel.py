@@ -0,0 +1,106 @@
+import streamlit as st
+from utils.scrape_jobs import QUEUED, get_scrape_jobs
+
+# How often a running job's progress is refreshed
+JOB_POLL_SECONDS = 1
+
+def job_owner(username, source, timepoint_modifier):
+    """
+    Build the owner key for a tab's background job
+
+    The key starts with the logged-in user, so a session viewing someone
+    else's data (e.g., an admin using Switch User) never picks up their jobs.
+
+    Args:
+        username: The user whose data the tab shows
+        source: The import (e.g., "thorne_connect")
+        timepoint_modifier: The timepoint (e.g., "T01")
+
+    Returns:
+        str: The owner key (e.g., "alice>alice:thorne_connect:T01")
+    """
+    return f"{st.session_state.get('username')}>{username}:{source}:{timepoint_modifier}"
+
+def current_job(job_key, owner):
+    """
+    Get the tab's background job, reattaching to the owner's latest job after a page refresh
+
+    Args:
+        job_key: Session state key holding the job id
+        owner: The job owner passed to submit (see job_owner)
+
+    Returns:
+        ScrapeJob or None
+    """
+    jobs = get_scrape_jobs()
+    job = jobs.get(st.session_state[job_key]) if job_key in st.session_state else jobs.find(owner)
+    # Only the login that started a job may see it or take its result
+    if job is not None and job.owner != owner:
+        job = None
+    if job is None:
+        st.session_state.pop(job_key, None)
+    else:
+        st.session_state[job_key] = job.id
+    return job
+
+def format_wait(seconds):
+    """
+    Describe an expected wait for the progress line
+
+    Args:
+        seconds: The estimated wait
+
+    Returns:
+        str: E.g., "1 min" or "40 s"
+    """
+    if seconds >= 60:
+        return f"{round(seconds / 60)} min"
+    return f"{max(round(seconds), 1)} s"
+
+def release_job(job_key, job):
+    """
+    Forget a finished job once the tab has handled its result
+
+    Args:
+        job_key: Session state key holding the job id
+        job: The finished ScrapeJob
+    """
+    st.session_state.pop(job_key, None)
+    get_scrape_jobs().discard(job.id)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def scrape_job_panel(job_id, key):
+    """
+    Show a background job's progress, polling until it finishes and then rerunning the app
+
+    Args:
+        job_id: The ScrapeJob id
+        key: Unique widget key prefix
+    """
+    jobs = get_scrape_jobs()
+    job = jobs.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+
+    events = job.events()
+    position = jobs.queue_position(job) if job.state == QUEUED else None
+    if position is not None:
+        eta = jobs.queue_eta(position)
+        message = f"Waiting for a free import slot (position {position} in line{f', about {format_wait(eta)}' if eta is not None else ''})"
+    elif job.state == QUEUED:
+        message = "Waiting for a free import slot"
+    elif events:
+        message = events[-1][1]
+    else:
+        message = "Starting"
+    st.markdown(f"**{job.label}**")
+    st.markdown(
+        f'<div style="margin-left:2.0em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ {message}</div>',
+        unsafe_allow_html=True
+    )
+
+    if job.cancel_requested:
+        st.caption("Cancelling...")
+    elif st.button("Cancel", key=f"{key}_cancel"):
+        job.cancel()
+        st.rerun()
@@ -0,0 +1,52 @@
+import streamlit as st
+from supabase_utils import create_download_url, get_if_exists
+
+def stored_file_download(path, file_name, key, label="Download Report"):
+    """
+    Render a download button for a stored file without loading it on every rerun
+    
+    Clicking the button signs a fresh URL and offers a link to it, so the
+    browser fetches the file straight from storage and the link is never
+    older than the click. Backends that cannot sign URLs (or a failed
+    signing request) fetch the file through the app instead.
+    
+    Args:
+        path: The full storage path (see build_supabase_path)
+        file_name: Name to save the download as
+        key: Unique widget key prefix
+        label: Button label
+    """
+    bytes_key = f"{key}_bytes"
+    if bytes_key in st.session_state:
+        # Drop the bytes once downloaded so later reruns stay light
+        st.download_button(
+            f"Save {file_name}",
+            st.session_state[bytes_key],
+            file_name=file_name,
+            key=f"{key}_save",
+            on_click=lambda: st.session_state.pop(bytes_key, None),
+        )
+        return
+    
+    if not st.button(label, key=f"{key}_prepare"):
+        return
+    try:
+        url = create_download_url(path, file_name)
+    except Exception as e:
+        print(f"Signed URL failed for {path}: {e}")
+        url = None
+    if url:
+        st.link_button(f"Save {file_name}", url)
+        return
+    
+    with st.spinner("Preparing download..."):
+        try:
+            file_bytes = get_if_exists(path)
+        except Exception as e:
+            st.error(f"Error retrieving file: {e}")
+            return
+    if isinstance(file_bytes, bytes):
+        st.session_state[bytes_key] = file_bytes
+        st.rerun()
+    else:
+        st.error("Failed to retrieve the file. Please try again.")
@@ -1,21 +1,16 @@
 import streamlit as st
 import pandas as pd
-import io
-from supabase_utils import get_user_supabase, build_supabase_path
+from supabase_utils import build_supabase_path, exists, read_dataframe, upsert_dataframe
 
 def thorne2_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
     st.markdown(f"<h1>{timepoint_modifier} Thorne Community Report</h1>", unsafe_allow_html=True)
-    user_supabase = get_user_supabase()
     filename = build_supabase_path(username, timepoint_id, "thorne2.csv")
-    bucket = user_supabase.storage.from_("data")
-    file_list = bucket.list(path=f"{username}/{timepoint_modifier}/")
-    file_exists = any(f["name"] == "thorne2.csv" for f in file_list)
+    file_exists = exists(filename)
     
     if file_exists:
         try:
-            csv_bytes = bucket.download(filename)
-            if isinstance(csv_bytes, bytes):
-                df = pd.read_csv(io.BytesIO(csv_bytes))
+            df = read_dataframe(username, timepoint_id, "thorne2.csv")
+            if df is not None:
                 st.markdown("Double-click any cell to reveal its full contents.")
                 st.dataframe(df)
                 st.success("Upload successful!")
@@ -45,10 +40,12 @@ def thorne2_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
             with st.spinner("Processing your file..."):
                 try:
                     df = pd.read_csv(uploaded)
-                    csv_bytes = df.to_csv(index=False).encode()
-                    bucket.upload(filename, csv_bytes, {"content-type": "text/csv"})
-                    st.session_state.thorne2_df = df
-                    st.success("Upload successful!")
-                    st.rerun()
+                    result = upsert_dataframe(username, timepoint_id, "thorne2.csv", df)
+                    if result.ok:
+                        st.session_state.thorne2_df = df
+                        st.success("Upload successful!")
+                        st.rerun()
+                    else:
+                        st.error(f"Failed to save file: {result.error}")
                 except Exception as e:
                     st.error(f"Failed to process file: {e}")
@@ -1,14 +1,18 @@
 import streamlit as st
-import pandas as pd
-import io
-import time
 from datetime import datetime
-from utils.scraping_utils import scrape_thorne_gut_report, get_thorne_available_tests, scrape_thorne_gut_report_by_date
-from supabase_utils import get_supabase_bucket, build_supabase_path
+from utils.scraping_utils import connect_thorne, scrape_thorne_gut_report_by_date, warm_browsers
+from utils.scrape_jobs import DONE, CANCELLED, get_scrape_jobs
+from supabase_utils import delete_dataframe, read_dataframe, upsert_dataframe, upsert_raw_json
+from components.scrape_job_panel import current_job, job_owner, release_job, scrape_job_panel
+
+def end_thorne_session():
+    """Close the in-memory Thorne login session and forget the listed tests."""
+    thorne_session = st.session_state.pop("thorne_session", None)
+    if thorne_session is not None:
+        thorne_session.close()
+    st.session_state.pop("thorne_available_tests", None)
 
 def thorne_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
-    bucket = get_supabase_bucket()
-    
     # Create timepoint-scoped session state keys
     csv_ready_key = f"thorne_csv_ready_{timepoint_modifier}"
     csv_key = f"thorne_csv_{timepoint_modifier}"
@@ -17,19 +21,16 @@ def thorne_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
     uploaded_key = f"thorne_supabase_uploaded_{timepoint_modifier}"
     deleting_key = f"deleting_thorne_in_progress_{timepoint_modifier}"
     init_key = f"to_initialize_thorne_csv_{timepoint_modifier}"
+    connect_job_key = f"thorne_connect_job_{timepoint_modifier}"
+    import_job_key = f"thorne_import_job_{timepoint_modifier}"
+    connect_job_owner = job_owner(username, "thorne_connect", timepoint_modifier)
+    import_job_owner = job_owner(username, "thorne_import", timepoint_modifier)
     
     # === Try to restore saved CSV (stateless ghost-block logic)
     if not st.session_state.get(csv_ready_key):
         try:
-            thorne_filename = build_supabase_path(username, timepoint_id, "thorne.csv")
-            res = bucket.download(thorne_filename)
-            files = bucket.list(path=f"{username}/{timepoint_modifier}/")
-            in_list = any(f["name"] == "thorne.csv" for f in files)
-            if res and len(res) > 0 and not in_list:
-                st.session_state[csv_ready_key] = False
-            elif res and len(res) > 0:
-                thorne_df = pd.read_csv(io.BytesIO(res))
-                st.session_state[csv_key] = res
+            thorne_df = read_dataframe(username, timepoint_id, "thorne.csv")
+            if thorne_df is not None:
                 st.session_state[df_key] = thorne_df
                 st.session_state[csv_ready_key] = True
             else:
@@ -48,27 +49,18 @@ def thorne_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
             st.session_state.pop(uploaded_key, None)
             st.session_state.pop("thorne_email", None)
             st.session_state.pop("thorne_password", None)
+            end_thorne_session()
             try:
-                thorne_filename = build_supabase_path(username, timepoint_id, "thorne.csv")
-                bucket.remove([thorne_filename])
-                max_attempts = 20
-                file_still_exists = True
-                for attempt in range(max_attempts):
-                    time.sleep(3)
-                    files = bucket.list(path=f"{username}/{timepoint_modifier}/")
-                    file_still_exists = any(f["name"] == "thorne.csv" for f in files)
-                    if not file_still_exists:
-                        break
-                if not file_still_exists:
+                result = delete_dataframe(username, timepoint_id, "thorne.csv", timeout=60)
+                if result.ok:
                     st.success("Resetting...")
-                    time.sleep(1.5)
                     st.session_state.skip_restore = True
                     st.session_state.deletion_successful = True
                     st.session_state.just_deleted = True
                     st.session_state.pop(deleting_key, None)
                     st.rerun()
                 else:
-                    st.error("File deletion timed out after 60 seconds. Please try again or check your connection.")
+                    st.error(f"File deletion could not be confirmed ({result.error}). Please try again or check your connection.")
             except Exception as e:
                 st.error(f"Something went wrong while deleting your file: {e}")
     elif st.session_state.get(csv_ready_key) and df_key in st.session_state:
@@ -85,6 +77,28 @@ def thorne_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
     <strong>Your Information Stays Private:</strong> We do not store your credentials. They are used to connect to Thorne to download your data, and then are erased from memory.
     </div>""", unsafe_allow_html=True)
         
+        # Start a browser while the user fills in the form
+        warm_browsers()
+        
+        # Logging in and importing run in the background; poll whichever is active
+        for job_key, owner in ((connect_job_key, connect_job_owner), (import_job_key, import_job_owner)):
+            job = current_job(job_key, owner)
+            if job is not None and not job.finished:
+                scrape_job_panel(job.id, job_key)
+                return
+            if job is not None:
+                release_job(job_key, job)
+                if job_key == connect_job_key:
+                    handle_connect_job(job)
+                else:
+                    handle_import_job(job, username, timepoint_id, timepoint_modifier)
+        
+        # A login only lasts a few minutes; send the user back to step 1 once it lapses
+        thorne_session = st.session_state.get("thorne_session")
+        if st.session_state.get("thorne_available_tests") and (thorne_session is None or thorne_session.expired):
+            end_thorne_session()
+            st.warning("Your Thorne session has expired. Please log in again.")
+        
         # Show step-by-step workflow
         if not st.session_state.get("thorne_available_tests"):
             # Step 1: Get credentials and fetch available test dates
@@ -98,21 +112,12 @@ def thorne_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
                     st.error("Please enter email and password.")
                     st.stop()
                 
-                with st.spinner("Importing Thorne Data"):
-                    status = st.empty()
-                    try:
-                        available_tests = get_thorne_available_tests(user_email, user_pass, status)
-                        if not available_tests:
-                            st.warning("No downloadable Gut Health results found.")
-                        else:
-                            st.session_state.thorne_available_tests = available_tests
-                            st.session_state.thorne_temp_email = user_email
-                            st.session_state.thorne_temp_password = user_pass
-                            st.rerun()
-                    except Exception as e:
-                        st.error(f"Failed to fetch tests: {type(e).__name__} — {e}")
-                    finally:
-                        status.empty()
+                # Log in once in the background; step 2 reuses the session instead of the password
+                job = get_scrape_jobs().submit(connect_job_owner, "Connecting to Thorne", connect_thorne, user_email, user_pass)
+                st.session_state.pop("thorne_email", None)
+                st.session_state.pop("thorne_password", None)
+                st.session_state[connect_job_key] = job.id
+                st.rerun()
         
         else:
             # Step 2: Show available test dates and let user select
@@ -134,62 +139,62 @@ def thorne_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
                     selected_test = available_tests[idx]
                     
                     st.session_state.pop("skip_restore", None)
-                    with st.spinner("Importing Selected Thorne Data"):
-                        status = st.empty()
-                        try:
-                            thorne_df = scrape_thorne_gut_report_by_date(
-                                st.session_state.thorne_temp_email,
-                                st.session_state.thorne_temp_password,
-                                selected_test["local_date"],
-                                status
-                            )
-                            
-                            status.markdown(
-                                '<div style="margin-left:2.3em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ Deleting Thorne credentials from memory</div>',
-                                unsafe_allow_html=True
-                            )
-                            
-                            # Clear credentials from session state
-                            st.session_state.pop("thorne_temp_email", None)
-                            st.session_state.pop("thorne_temp_password", None)
-                            st.session_state.pop("thorne_available_tests", None)
-                            st.session_state.pop("thorne_email", None)
-                            st.session_state.pop("thorne_password", None)
-                            
-                            thorne_csv_bytes = thorne_df.to_csv(index=False).encode()
-                            st.session_state[csv_key] = thorne_csv_bytes
-                            st.session_state[df_key] = thorne_df
-                            st.session_state[filename_key] = f"{username}_thorne.csv"
-                            st.session_state[f"thorne_csv_file_{timepoint_modifier}"] = thorne_csv_bytes
-                            
-                            # Upload to Supabase
-                            try:
-                                thorne_filename = build_supabase_path(username, timepoint_id, "thorne.csv")
-                                bucket.remove([thorne_filename])
-                            except Exception:
-                                pass
-                            
-                            response = bucket.upload(
-                                path=thorne_filename,
-                                file=thorne_csv_bytes,
-                                file_options={"content-type": "text/csv"}
-                            )
-                            res_data = response.__dict__
-                            if "error" in res_data and res_data["error"]:
-                                st.error("Upload failed.")
-                            else:
-                                st.session_state[uploaded_key] = True
-                            
-                            status.markdown(
-                                '<div style="margin-left:2.3em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ Import successful!</div>',
-                                unsafe_allow_html=True
-                            )
-                            st.session_state[init_key] = True
-                            st.rerun()
-                            
-                        except Exception as e:
-                            st.error(f"Import failed: {type(e).__name__} — {e}")
-                        finally:
-                                status.empty()
-        
+                    job = get_scrape_jobs().submit(
+                        import_job_owner,
+                        "Importing Selected Thorne Data",
+                        scrape_thorne_gut_report_by_date,
+                        st.session_state.thorne_session,
+                        selected_test["local_date"],
+                    )
+                    st.session_state[import_job_key] = job.id
+                    st.rerun()
+
+def handle_connect_job(job):
+    """Keep a finished login job's session and test list for step 2, or report why it failed."""
+    if job.state == DONE:
+        thorne_session, available_tests = job.result
+        if not available_tests:
+            st.warning("No downloadable Gut Health results found.")
+        else:
+            st.session_state.thorne_available_tests = available_tests
+            st.session_state.thorne_session = thorne_session
+    elif job.state == CANCELLED:
+        if job.result:
+            job.result[0].close()
+        st.info("Connection cancelled.")
+    else:
+        st.error(f"Failed to fetch tests: {type(job.error).__name__} — {job.error}")
 
+def handle_import_job(job, username, timepoint_id, timepoint_modifier):
+    """Save a finished import job's report, or report why it failed."""
+    if job.state == CANCELLED:
+        st.info("Import cancelled.")
+        return
+    if job.state != DONE:
+        st.error(f"Import failed: {type(job.error).__name__} — {job.error}")
+        return
+    
+    # Drop the login session from memory
+    end_thorne_session()
+    
+    with st.spinner("Saving Thorne Data"):
+        thorne_df, report = job.result
+        thorne_csv_bytes = thorne_df.to_csv(index=False).encode()
+        st.session_state[f"thorne_csv_{timepoint_modifier}"] = thorne_csv_bytes
+        st.session_state[f"thorne_df_{timepoint_modifier}"] = thorne_df
+        st.session_state[f"thorne_csv_filename_{timepoint_modifier}"] = f"{username}_thorne.csv"
+        st.session_state[f"thorne_csv_file_{timepoint_modifier}"] = thorne_csv_bytes
+        
+        # Upload to Supabase, replacing any previous import
+        result = upsert_dataframe(username, timepoint_id, "thorne.csv", thorne_df)
+        if result.ok:
+            # Keep the source report so the CSV can be rebuilt without logging in again
+            raw_result = upsert_raw_json(username, timepoint_id, "thorne.csv", report)
+            if not raw_result.ok:
+                print(f"Storing raw Thorne report for {username} failed: {raw_result.error}")
+    if not result.ok:
+        st.error(f"Upload failed: {result.error}")
+        return
+    st.session_state[f"thorne_supabase_uploaded_{timepoint_modifier}"] = True
+    st.session_state[f"to_initialize_thorne_csv_{timepoint_modifier}"] = True
+    st.rerun()
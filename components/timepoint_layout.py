@@ -14,7 +14,68 @@ from components.matter_overview_tab import matter_overview_tab
 from components.matter_memory_ratings_tab import matter_memory_ratings_tab
 from components.hri_tab import hri_tab
 from components.oprl_tab import oprl_tab
-from components.admin_tab import admin_tab
+from components.admin_tab import admin_tab, storage_diagnostics_panel
+from supabase_utils import prefetch_timepoint
+from utils.storage_metrics import StorageStats, storage_tab, use_stats
+
+# Tab groups in display order. Only the selected tab's function runs on a
+# rerun, so each tab loads its own data when it is opened.
+TAB_GROUPS = {
+    "Screening": [
+        ("Clinical Intake", clinical_intake_tab),
+        ("Toxicology", toxicology_tab),
+        ("Prenuvo", prenuvo_tab),
+    ],
+    "Labs": [
+        ("Function Health", function_health_tab),
+        ("Biostarks", biostarks_tab),
+        ("Trudiagnostic", trudiagnostic_tab),
+        ("Thorne Overview", thorne_tab),
+        ("Thorne Community Report", thorne2_tab),
+    ],
+    "Emotion & Cognition": [
+        ("Matter Overview", matter_overview_tab),
+        ("Matter Memory Ratings", matter_memory_ratings_tab),
+        ("HRI", hri_tab),
+        ("Surveys", surveys_tab),
+    ],
+    "Habits & Performance": [
+        ("Lifestyle", lifestyle_tab),
+        ("OPRL", oprl_tab),
+    ],
+}
+
+def lazy_tabs(tab_names, key):
+    """
+    Render a tab bar and return the selected tab name
+    
+    Unlike st.tabs, nothing runs for the tabs that are not selected.
+    
+    Args:
+        tab_names: The tab labels in display order
+        key: Session state key holding the selection
+    
+    Returns:
+        str: The selected tab name (the first tab if none is selected)
+    """
+    last_key = f"{key}_last"
+    
+    def keep_selection():
+        # Clicking the active segment deselects it; select it again instead
+        if st.session_state.get(key) is None:
+            st.session_state[key] = st.session_state.get(last_key, tab_names[0])
+        st.session_state[last_key] = st.session_state[key]
+    
+    if st.session_state.get(key) not in tab_names:
+        st.session_state[key] = st.session_state.get(last_key) if st.session_state.get(last_key) in tab_names else tab_names[0]
+    selected = st.segmented_control(
+        "Tabs",
+        tab_names,
+        key=key,
+        on_change=keep_selection,
+        label_visibility="collapsed",
+    )
+    return selected or tab_names[0]
 
 def render_timepoint_layout(timepoint_id, timepoint_name, authenticator=None):
     """
@@ -41,69 +102,27 @@ def render_timepoint_layout(timepoint_id, timepoint_name, authenticator=None):
 
     # Extract timepoint number for modifier (e.g., "T_01" -> "T01")
     timepoint_modifier = timepoint_id.replace("_", "")
-    
-    # Create tab names list (original names without modifiers)
-    main_tab_names = [
-        "Screening",
-        "Labs", 
-        "Emotion & Cognition",
-        "Habits & Performance",
-    ]
-    
-    main_tabs = st.tabs(main_tab_names)
 
-    # Screening
-    with main_tabs[0]:
-        screening_tabs = st.tabs(["Clinical Intake", "Toxicology", "Prenuvo"])
-        with screening_tabs[0]:
-            clinical_intake_tab(display_username, timepoint_id, timepoint_modifier)
-        with screening_tabs[1]:
-            toxicology_tab(display_username, timepoint_id, timepoint_modifier)
-        with screening_tabs[2]:
-            prenuvo_tab(display_username, timepoint_id, timepoint_modifier)
+    # Count this rerun's storage calls against the session
+    if "storage_stats" not in st.session_state:
+        st.session_state["storage_stats"] = StorageStats()
+    storage_stats = st.session_state["storage_stats"]
+    storage_stats.start_rerun()
+    use_stats(storage_stats)
 
-    # Labs
-    with main_tabs[1]:
-        labs_tabs = st.tabs([
-            "Function Health",
-            "Biostarks",
-            "Trudiagnostic",
-            "Thorne Overview",
-            "Thorne Community Report"
-        ])
-        with labs_tabs[0]:
-            function_health_tab(display_username, timepoint_id, timepoint_modifier)
-        with labs_tabs[1]:
-            biostarks_tab(display_username, timepoint_id, timepoint_modifier)
-        with labs_tabs[2]:
-            trudiagnostic_tab(display_username, timepoint_id, timepoint_modifier)
-        with labs_tabs[3]:
-            thorne_tab(display_username, timepoint_id, timepoint_modifier)
-        with labs_tabs[4]:
-            thorne2_tab(display_username, timepoint_id, timepoint_modifier)
-
-    # Emotion & Cognition
-    with main_tabs[2]:
-        ec_tabs = st.tabs([
-            "Matter Overview",
-            "Matter Memory Ratings",
-            "HRI",
-            "Surveys"
-        ])
-        with ec_tabs[0]:
-            matter_overview_tab(display_username, timepoint_id, timepoint_modifier)
-        with ec_tabs[1]:
-            matter_memory_ratings_tab(display_username, timepoint_id, timepoint_modifier)
-        with ec_tabs[2]:
-            hri_tab(display_username, timepoint_id, timepoint_modifier)
-        with ec_tabs[3]:
-            surveys_tab(display_username, timepoint_id, timepoint_modifier)
-
-    # Habits & Performance
-    with main_tabs[3]:
-        hp_tabs = st.tabs(["Lifestyle", "OPRL"])
-        with hp_tabs[0]:
-            lifestyle_tab(display_username, timepoint_id, timepoint_modifier)
-        with hp_tabs[1]:
-            oprl_tab(display_username, timepoint_id, timepoint_modifier)
+    # Fetch every artifact for this page concurrently when the page is first
+    # opened; later reruns and tab switches read from the blob cache
+    prefetched_key = f"prefetched_{display_username}_{timepoint_modifier}"
+    if not st.session_state.get(prefetched_key):
+        with storage_tab("Prefetch"):
+            prefetch_timepoint(display_username, timepoint_id)
+        st.session_state[prefetched_key] = True
+    
+    main_tab = lazy_tabs(list(TAB_GROUPS), f"main_tab_{timepoint_modifier}")
+    sub_tabs = dict(TAB_GROUPS[main_tab])
+    sub_tab = lazy_tabs(list(sub_tabs), f"{main_tab}_tab_{timepoint_modifier}")
+    with storage_tab(sub_tab):
+        sub_tabs[sub_tab](display_username, timepoint_id, timepoint_modifier)
 
+    if is_admin:
+        storage_diagnostics_panel(storage_stats)
@@ -1,7 +1,5 @@
 import streamlit as st
-import pandas as pd
-import io
-from supabase_utils import get_user_supabase, build_supabase_path
+from supabase_utils import build_supabase_path, exists, read_dataframe, upsert_dataframe
 from utils.toxicology_utils import extract_results_to_dataframe, humanize_result_text
 
 
@@ -13,21 +11,18 @@ def toxicology_tab(username: str, timepoint_id="T_01", timepoint_modifier="T01")
         st.info("No toxicology data were collected for Time Point 02.")
         return
     
-    user_supabase = get_user_supabase()
-    bucket = user_supabase.storage.from_("data")
     csv_key = build_supabase_path(username, timepoint_id, "toxicology.csv")
 
     # Check if CSV already exists
-    file_list = bucket.list(path=f"{username}/{timepoint_modifier}/")
-    csv_exists = any(f["name"] == "toxicology.csv" for f in file_list)
+    csv_exists = exists(csv_key)
 
     if csv_exists:
         try:
-            csv_bytes = bucket.download(csv_key)
-            if isinstance(csv_bytes, bytes):
-                df = pd.read_csv(io.BytesIO(csv_bytes))
+            df = read_dataframe(username, timepoint_id, "toxicology.csv")
+            if df is not None:
+                # The cached frame is shared, so build a new one instead of editing it
                 if "Result" in df.columns:
-                    df["Result"] = df["Result"].astype(str).apply(humanize_result_text)
+                    df = df.assign(Result=df["Result"].astype(str).apply(humanize_result_text))
                 st.markdown("Double-click any cell to reveal its full contents.")
                 st.dataframe(df)
                 st.success("Upload successful!")
@@ -58,12 +53,12 @@ def toxicology_tab(username: str, timepoint_id="T_01", timepoint_modifier="T01")
                 try:
                     pdf_bytes = uploaded.read()
                     df = extract_results_to_dataframe(pdf_bytes)
-                    # Save CSV to Supabase
-                    csv_buffer = io.StringIO()
-                    df.to_csv(csv_buffer, index=False)
-                    csv_content = csv_buffer.getvalue().encode("utf-8")
-                    bucket.upload(csv_key, csv_content, {"content-type": "text/csv"})
-                    st.success("Upload successful!")
-                    st.rerun()
+                    # Save CSV (and its typed Parquet copy) to Supabase
+                    result = upsert_dataframe(username, timepoint_id, "toxicology.csv", df)
+                    if result.ok:
+                        st.success("Upload successful!")
+                        st.rerun()
+                    else:
+                        st.error(f"Failed to save file: {result.error}")
                 except Exception as e:
                     st.error(f"Failed to process file: {e}") 
@@ -4,28 +4,18 @@ import os
 import time
 import fitz
 from utils.redaction_utils import redact_trudiagnostic_pdf
-from supabase_utils import get_user_supabase, build_supabase_path
-import io
+from supabase_utils import build_supabase_path, exists, upload_file, upsert_file
+from components.stored_file_download import stored_file_download
 from datetime import datetime
 import streamlit.components.v1 as components
 
 def trudiagnostic_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
-    user_supabase = get_user_supabase()
     filename = build_supabase_path(username, timepoint_id, "redacted_trudiagnostic_report.pdf")
-    bucket = user_supabase.storage.from_("data")
-    file_list = bucket.list(path=f"{username}/{timepoint_modifier}/")
-    file_exists = any(f["name"] == "redacted_trudiagnostic_report.pdf" for f in file_list)
+    file_exists = exists(filename)
     st.markdown(f"<h1>{timepoint_modifier} Trudiagnostic</h1>", unsafe_allow_html=True)
     if file_exists:
         st.success("Your report was successfully redacted and saved!")
-        try:
-            pdf_bytes = bucket.download(filename)
-            if isinstance(pdf_bytes, bytes):
-                st.download_button("Download Report", pdf_bytes, file_name="redacted_trudiagnostic_report.pdf")
-            else:
-                st.error("Failed to retrieve the file. Please try again.")
-        except Exception as e:
-            st.error(f"Error retrieving file: {e}")
+        stored_file_download(filename, "redacted_trudiagnostic_report.pdf", key=f"trudiagnostic_download_{timepoint_modifier}")
     elif "trudiagnostic_pdf_for_review" in st.session_state:
         file_bytes = st.session_state.trudiagnostic_pdf_for_review
         st.markdown("""
@@ -59,12 +49,12 @@ def trudiagnostic_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
         components.html(scrollable_html, height=670, scrolling=False)
         if st.button("Approve Redaction", key="approve_trudiagnostic"):
             with st.spinner("Saving redacted file..."):
-                try:
-                    bucket.upload(filename, file_bytes, {"content-type": "application/pdf"})
+                result = upsert_file(filename, file_bytes, "application/pdf")
+                if result.ok:
                     st.session_state.pop("trudiagnostic_pdf_for_review", None)
                     st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to save redacted file: {e}")
+                else:
+                    st.error(f"Failed to save redacted file: {result.error}")
         if st.button("Report an Issue", key="report_trudiagnostic_issue"):
             st.session_state.trudiagnostic_show_report_box = True
         if st.button("Start Over", key="start_over_trudiagnostic_before_approve"):
@@ -74,10 +64,10 @@ def trudiagnostic_tab(username, timepoint_id="T_01", timepoint_modifier="T01"):
             issue = st.text_area("Describe the issue with redaction:")
             if st.button("Submit Issue", key="submit_trudiagnostic_issue"):
                 timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S-%f")
-                bucket.upload(
+                upload_file(
                     f"{username}/issues/issue_{timestamp}.txt",
                     issue.encode("utf-8"),
-                    {"content-type": "text/plain"}
+                    "text/plain"
                 )
                 st.session_state.trudiagnostic_issue_submitted = True
                 st.session_state.pop("trudiagnostic_show_report_box", None)
@@ -1,10 +1,14 @@
 import streamlit as st
 from components.timepoint_layout import render_timepoint_layout
 from auth import get_authenticator
+from utils.driver_factory import preload_driver
 
 # Set page config FIRST - before any other Streamlit commands
 st.set_page_config(page_title="Biosnap", layout="centered")
 
+# Find chromedriver in the background once per process, before the first import needs it
+preload_driver()
+
 # Initialize authenticator once at the module level
 authenticator = get_authenticator()
 
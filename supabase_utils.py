@@ -1,12 +1,95 @@
+import io
 import os
+import json
+import time
+import threading
+import importlib.util
+from collections import namedtuple
+from urllib.parse import quote
 from supabase import create_client
+import pandas as pd
 from dotenv import load_dotenv
+from utils.blob_cache import get_blob_cache
+from utils.frame_cache import get_frame_cache
+from utils.local_storage import get_local_bucket
+from utils.async_storage import AsyncStorage, PooledAsyncStorageClient, ThreadedAsyncBucket
+from utils.storage_metrics import InstrumentedBucket, bind_recorder
+from utils.compression import compress, decompress
+
+# Process-wide client and bucket handle, shared by every Streamlit session.
+# The storage client keeps one pooled httpx session, so reusing it keeps
+# connections alive across tabs and reruns instead of re-handshaking each time.
+_client_lock = threading.Lock()
+_shared_client = None
+_shared_bucket = None
+_async_storage = None
+
+# Listing of each {username}/{Txx}/ folder, reused by every tab until it
+# expires or a write made through the app invalidates it.
+MANIFEST_TTL_SECONDS = 30
+_manifest_lock = threading.Lock()
+_manifests = {}
+# Bumped by every invalidation, so a listing that raced a write is not cached
+_manifest_generations = {}
+
+# Confirmed writes poll a filtered listing with exponential backoff until the
+# change is visible or the deadline passes.
+WRITE_CONFIRM_TIMEOUT_SECONDS = 60
+WRITE_CONFIRM_INITIAL_DELAY = 0.1
+WRITE_CONFIRM_MAX_DELAY = 3.0
+
+WriteResult = namedtuple("WriteResult", ["ok", "attempts", "elapsed", "error"])
+
+# Tabular artifacts are also stored as typed Parquet next to the CSV when
+# pyarrow is installed; the CSV stays the canonical, backward-compatible copy.
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+CATEGORICAL_MAX_RATIO = 0.5
+
+# Raw source payloads (e.g., the Thorne report JSON) are stored next to the
+# CSV derived from them, so the CSV can be rebuilt without a new import.
+RAW_JSON_CONTENT_TYPE = "application/json"
+
+# Data artifacts a timepoint page can render. Submission markers are not
+# listed here: the manifest answers whether they exist without a download.
+TIMEPOINT_ARTIFACTS = [
+    "clinical.csv",
+    "toxicology.csv",
+    "functionhealth.csv",
+    "biostarks.csv",
+    "thorne.csv",
+    "thorne2.csv",
+    "matter.csv",
+    "matter2.csv",
+    "hri.csv",
+    "surveys.csv",
+    "lifestyle.csv",
+    "oprl.csv",
+]
+
+# Cap on storage requests the async layer keeps in flight at once
+ASYNC_MAX_CONCURRENCY = 32
+
+# Signed download links are minted when the user asks for the file and
+# outlive any realistic wait between that click and the browser's fetch
+SIGNED_URL_TTL_SECONDS = 60 * 60
 
 def get_user_supabase():
-    load_dotenv()
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_KEY")
-    return create_client(url, key)
+    """
+    Get the shared Supabase client, creating it on first use
+    
+    Returns:
+        The process-wide Supabase client
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _client_lock:
+            if _shared_client is None:
+                load_dotenv()
+                url = os.getenv("SUPABASE_URL")
+                key = os.getenv("SUPABASE_SERVICE_KEY")
+                _shared_client = create_client(url, key)
+    return _shared_client
 
 def convert_timepoint_id_to_format(timepoint_id):
     """
@@ -39,8 +122,564 @@ def get_supabase_bucket():
     """
     Get the Supabase storage bucket for data files
     
+    Set BIOSNAP_STORAGE_BACKEND=local to use a directory on disk instead of
+    Supabase (see utils/local_storage.py). Calls through the bucket are timed
+    and counted (see utils/storage_metrics.py).
+    
+    Returns:
+        The shared Supabase storage bucket
+    """
+    global _shared_bucket
+    if _shared_bucket is None:
+        load_dotenv()
+        if os.getenv("BIOSNAP_STORAGE_BACKEND", "supabase").lower() == "local":
+            with _client_lock:
+                if _shared_bucket is None:
+                    _shared_bucket = InstrumentedBucket(get_local_bucket())
+            return _shared_bucket
+        user_supabase = get_user_supabase()
+        with _client_lock:
+            if _shared_bucket is None:
+                _shared_bucket = InstrumentedBucket(user_supabase.storage.from_("data"))
+    return _shared_bucket
+
+def get_async_storage():
+    """
+    Get the shared asyncio storage layer for concurrent reads
+    
+    Against Supabase it uses its own pooled HTTP/2 connection (HTTP/1.1 if
+    h2 is missing); with the local backend it wraps the local bucket.
+    
+    Returns:
+        AsyncStorage: The process-wide async storage layer
+    """
+    global _async_storage
+    if _async_storage is None:
+        bucket = get_supabase_bucket()
+        with _client_lock:
+            if _async_storage is None:
+                if os.getenv("BIOSNAP_STORAGE_BACKEND", "supabase").lower() == "local":
+                    bucket_factory = lambda: ThreadedAsyncBucket(bucket.bucket)
+                else:
+                    client = get_user_supabase()
+                    key = os.getenv("SUPABASE_SERVICE_KEY")
+                    headers = {"apiKey": key, "Authorization": f"Bearer {key}"}
+                    bucket_factory = lambda: PooledAsyncStorageClient(
+                        client.storage_url, headers, client.options.storage_client_timeout
+                    ).from_("data")
+                _async_storage = AsyncStorage(bucket_factory, ASYNC_MAX_CONCURRENCY)
+    return _async_storage
+
+def download_many(paths):
+    """
+    Download several files concurrently
+    
+    Args:
+        paths: Full storage paths
+    
+    Returns:
+        dict: Path -> bytes (decompressed) for every file downloaded; failed paths are left out
+    """
+    return {path: decompress(data) for path, data in _download_many_stored(paths).items()}
+
+def _download_many_stored(paths):
+    """Download files concurrently as stored (still compressed), leaving out failures."""
+    storage = get_async_storage()
+    results = storage.run(storage.download_many(list(paths), bind_recorder()))
+    return {path: data for path, data in results.items() if not isinstance(data, Exception)}
+
+def list_many(folders, options=None):
+    """
+    List several folders concurrently (e.g., every user's timepoint folder)
+    
+    Args:
+        folders: Folder paths (e.g., "user/T01/")
+        options: Listing options applied to every folder
+    
+    Returns:
+        dict: Folder -> list of entries for every folder listed; failed folders are left out
+    """
+    storage = get_async_storage()
+    results = storage.run(storage.list_many(list(folders), options, bind_recorder()))
+    return {folder: entries for folder, entries in results.items() if not isinstance(entries, Exception)}
+
+def build_supabase_folder(username, timepoint_id):
+    """
+    Build the Supabase storage folder for a user's timepoint: username/timepoint/
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+    
+    Returns:
+        str: The folder path for Supabase storage
+    """
+    timepoint = convert_timepoint_id_to_format(timepoint_id)
+    return f"{username}/{timepoint}/"
+
+def get_timepoint_manifest(username, timepoint_id, max_age=MANIFEST_TTL_SECONDS):
+    """
+    Get the listing of a user's timepoint folder, keyed by file name
+    
+    The folder is listed at most once per TTL window and shared by all tabs,
+    so a page render costs a single list round trip.
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+        max_age: Maximum age in seconds of a cached listing (0 forces a refresh)
+    
+    Returns:
+        dict: File name -> storage metadata (size, updated_at, ...)
+    """
+    key = (username, convert_timepoint_id_to_format(timepoint_id))
+    with _manifest_lock:
+        cached = _manifests.get(key)
+        generation = _manifest_generations.get(key, 0)
+    if cached and time.monotonic() - cached[0] < max_age:
+        return cached[1]
+    fetched_at = time.monotonic()
+    files = get_supabase_bucket().list(path=build_supabase_folder(username, timepoint_id), options={"limit": 1000})
+    manifest = {f["name"]: f for f in files if f.get("name")}
+    with _manifest_lock:
+        if _manifest_generations.get(key, 0) == generation:
+            _manifests[key] = (fetched_at, manifest)
+    return manifest
+
+def invalidate_manifest(username, timepoint_id):
+    """
+    Drop the cached listing of a user's timepoint folder
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+    """
+    key = (username, convert_timepoint_id_to_format(timepoint_id))
+    with _manifest_lock:
+        _manifests.pop(key, None)
+        _manifest_generations[key] = _manifest_generations.get(key, 0) + 1
+
+def _invalidate_path(path):
+    """Invalidate the manifest and cached frames for a storage path."""
+    parts = path.split("/")
+    if len(parts) == 3:
+        invalidate_manifest(parts[0], parts[1])
+        get_frame_cache().invalidate(parts[0], parts[1], parts[2])
+
+def upload_file(path, data, content_type, upsert=False):
+    """
+    Upload a file to the data bucket and invalidate its folder manifest
+    
+    CSV and JSON payloads are compressed when BIOSNAP_STORAGE_COMPRESSION is
+    set (see utils/compression.py); download_file undoes it transparently.
+    
+    Args:
+        path: The full storage path (see build_supabase_path)
+        data: The file contents as bytes
+        content_type: The MIME type stored with the file
+        upsert: Replace an existing file in the same request
+    
+    Returns:
+        The storage API response
+    """
+    data, content_type = compress(data, content_type)
+    file_options = {"content-type": content_type}
+    if upsert:
+        file_options["x-upsert"] = "true"
+    try:
+        return get_supabase_bucket().upload(path=path, file=data, file_options=file_options)
+    finally:
+        _invalidate_path(path)
+
+def remove_files(paths):
+    """
+    Remove files from the data bucket and invalidate their folder manifests
+    
+    Args:
+        paths: List of full storage paths
+    
+    Returns:
+        The storage API response
+    """
+    try:
+        return get_supabase_bucket().remove(paths)
+    finally:
+        for path in paths:
+            _invalidate_path(path)
+
+def stat(path):
+    """
+    Get storage metadata for a file without downloading it
+    
+    Files in a timepoint folder are answered from the cached manifest; other
+    paths use a single filtered listing of their parent folder.
+    
+    Args:
+        path: The full storage path (see build_supabase_path)
+    
+    Returns:
+        dict: The file's metadata (size, updated_at, ...), or None if missing
+    """
+    parts = path.split("/")
+    if len(parts) == 3:
+        return get_timepoint_manifest(parts[0], parts[1]).get(parts[2])
+    return _lookup(path)
+
+def _lookup(path):
+    """Get a file's metadata with one filtered listing, bypassing the manifest."""
+    folder, _, name = path.rpartition("/")
+    files = get_supabase_bucket().list(path=folder, options={"search": name})
+    return next((f for f in files if f.get("name") == name), None)
+
+def _confirm(path, is_done, started, timeout):
+    """Poll a file's metadata with exponential backoff until is_done(meta) or the deadline."""
+    delay = WRITE_CONFIRM_INITIAL_DELAY
+    attempts = 0
+    error = None
+    while True:
+        attempts += 1
+        try:
+            if is_done(_lookup(path)):
+                return WriteResult(True, attempts, time.monotonic() - started, None)
+        except Exception as e:
+            error = str(e)
+        remaining = timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            return WriteResult(False, attempts, time.monotonic() - started, error or f"Timed out after {timeout} seconds")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, WRITE_CONFIRM_MAX_DELAY)
+
+def upsert_file(path, data, content_type, timeout=WRITE_CONFIRM_TIMEOUT_SECONDS):
+    """
+    Create or replace a file in one request and confirm the new version is listed
+    
+    Args:
+        path: The full storage path (see build_supabase_path)
+        data: The file contents as bytes
+        content_type: The MIME type stored with the file
+        timeout: Seconds to wait for the write to become visible
+    
+    Returns:
+        WriteResult: ok, attempts, elapsed seconds and error message
+    """
+    started = time.monotonic()
+    # Compress up front so the size check compares against the stored payload
+    data, content_type = compress(data, content_type)
+    try:
+        upload_file(path, data, content_type, upsert=True)
+    except Exception as e:
+        return WriteResult(False, 0, time.monotonic() - started, str(e))
+    return _confirm(
+        path,
+        lambda meta: meta is not None and (meta.get("metadata") or {}).get("size", len(data)) == len(data),
+        started,
+        timeout,
+    )
+
+def delete_file(path, timeout=WRITE_CONFIRM_TIMEOUT_SECONDS):
+    """
+    Remove a file and confirm it is no longer listed
+    
+    Args:
+        path: The full storage path (see build_supabase_path)
+        timeout: Seconds to wait for the removal to become visible
+    
+    Returns:
+        WriteResult: ok, attempts, elapsed seconds and error message
+    """
+    started = time.monotonic()
+    try:
+        remove_files([path])
+    except Exception as e:
+        return WriteResult(False, 0, time.monotonic() - started, str(e))
+    return _confirm(path, lambda meta: meta is None, started, timeout)
+
+def exists(path):
+    """
+    Check whether a file exists in the data bucket
+    
+    Args:
+        path: The full storage path (see build_supabase_path)
+    
+    Returns:
+        bool: True if the file exists
+    """
+    return stat(path) is not None
+
+def get_if_exists(path):
+    """
+    Download a file only if the listing says it exists
+    
+    Missing files cost no download and no failed request.
+    
+    Args:
+        path: The full storage path (see build_supabase_path)
+    
+    Returns:
+        bytes: The file contents, or None if the file does not exist
+    """
+    meta = stat(path)
+    if meta is None:
+        return None
+    return download_file(path, meta)
+
+def create_download_url(path, file_name=None, expires_in=SIGNED_URL_TTL_SECONDS):
+    """
+    Sign a fresh URL the browser can download a file from directly
+    
+    The file's bytes never pass through the app server. Every call signs a
+    new URL, so call it when the user asks for the file rather than while
+    rendering the page (a link left on an open page would expire).
+    
+    Args:
+        path: The full storage path
+        file_name: Name to save the download as (forces a download rather than a preview)
+        expires_in: Seconds the URL stays valid
+    
+    Returns:
+        str: The signed URL, or None if the file is missing or the backend cannot sign URLs (e.g., the local backend)
+    """
+    bucket = get_supabase_bucket()
+    if not hasattr(bucket, "create_signed_url") or stat(path) is None:
+        return None
+    url = bucket.create_signed_url(path, expires_in)["signedURL"]
+    if file_name:
+        url += f"&download={quote(file_name)}"
+    return url
+
+def file_version(meta):
+    """
+    Get a version tag for a file from its listing metadata
+    
+    Args:
+        meta: The file's storage metadata (see stat)
+    
+    Returns:
+        str: The ETag, or updated_at if the listing has no ETag
+    """
+    return (meta.get("metadata") or {}).get("eTag") or meta.get("updated_at")
+
+def download_file(path, meta):
+    """
+    Download a file through the shared blob cache
+    
+    The cache keeps the stored (possibly compressed) payload; it is
+    decompressed on the way out.
+    
+    Args:
+        path: The full storage path
+        meta: The file's storage metadata, used to version the cache entry
+    
+    Returns:
+        bytes: The file contents
+    """
+    cache = get_blob_cache()
+    version = file_version(meta)
+    data = cache.get(path, version)
+    if data is None:
+        data = get_supabase_bucket().download(path)
+        cache.put(path, version, data)
+    return decompress(data)
+
+def prefetch_timepoint(username, timepoint_id, filenames=None):
+    """
+    Download a timepoint's artifacts concurrently ahead of the tabs
+    
+    Only files present in the manifest are fetched, and files already in the
+    blob cache cost nothing. The rest are downloaded together on the async
+    storage layer and stored in the blob cache, so the page waits for the
+    slowest download rather than the sum of all of them. Failures are left
+    for the tab to retry.
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+        filenames: File names to fetch (defaults to TIMEPOINT_ARTIFACTS)
+    
+    Returns:
+        dict: File name -> bytes for every file fetched
+    """
+    try:
+        manifest = get_timepoint_manifest(username, timepoint_id)
+    except Exception:
+        return {}
+    sources = {name: _dataframe_source(username, timepoint_id, name) for name in (filenames or TIMEPOINT_ARTIFACTS) if name in manifest}
+    cache = get_blob_cache()
+    results = {}
+    missing = {}
+    for name, (path, meta) in sources.items():
+        data = cache.get(path, file_version(meta))
+        if data is None:
+            missing[path] = (name, meta)
+        else:
+            results[name] = decompress(data)
+    if missing:
+        try:
+            downloaded = _download_many_stored(missing)
+        except Exception:
+            downloaded = {}
+        for path, data in downloaded.items():
+            name, meta = missing[path]
+            cache.put(path, file_version(meta), data)
+            results[name] = decompress(data)
+    return results
+
+def read_dataframe(username, timepoint_id, filename):
+    """
+    Read a stored CSV artifact as a DataFrame through the shared frame cache
+    
+    Parsed frames are shared by all sessions and keyed by the file's version,
+    so only the first reader after a change downloads and parses it. The
+    returned frame must not be modified in place.
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+        filename: The file name (e.g., "thorne.csv")
+    
+    Returns:
+        DataFrame: The parsed artifact, or None if it does not exist
+    """
+    path, meta = _dataframe_source(username, timepoint_id, filename)
+    if path is None:
+        return None
+    cache = get_frame_cache()
+    key = (username, convert_timepoint_id_to_format(timepoint_id), filename, f"{path.rsplit('.', 1)[-1]}:{file_version(meta)}")
+    df = cache.get(key)
+    if df is None:
+        data = download_file(path, meta)
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(io.BytesIO(data))
+        else:
+            df = pd.read_csv(io.BytesIO(data))
+        cache.put(key, df)
+    return df
+
+def columnar_filename(filename):
+    """
+    Get the name of the Parquet copy of a CSV artifact (e.g., "thorne.csv" -> "thorne.parquet")
+    
+    Args:
+        filename: The CSV file name
+    
+    Returns:
+        str: The Parquet file name
+    """
+    return f"{filename.rsplit('.', 1)[0]}.parquet"
+
+def _dataframe_source(username, timepoint_id, filename):
+    """Pick the Parquet copy of an artifact if it is at least as new as its CSV, else the CSV."""
+    csv_path = build_supabase_path(username, timepoint_id, filename)
+    csv_meta = stat(csv_path)
+    if csv_meta is None:
+        return None, None
+    if PARQUET_AVAILABLE and filename.endswith(".csv"):
+        parquet_path = build_supabase_path(username, timepoint_id, columnar_filename(filename))
+        parquet_meta = stat(parquet_path)
+        if parquet_meta is not None and (parquet_meta.get("updated_at") or "") >= (csv_meta.get("updated_at") or ""):
+            return parquet_path, parquet_meta
+    return csv_path, csv_meta
+
+def _to_columnar(df):
+    """Convert low-cardinality text columns (Category, Risk, section, ...) to categoricals."""
+    typed = df.copy()
+    for column in typed.columns:
+        if typed[column].dtype == object and len(typed) and typed[column].nunique() <= len(typed) * CATEGORICAL_MAX_RATIO:
+            typed[column] = typed[column].astype("category")
+    return typed
+
+def upsert_dataframe(username, timepoint_id, filename, df, timeout=WRITE_CONFIRM_TIMEOUT_SECONDS):
+    """
+    Store a DataFrame as CSV plus a typed Parquet copy for faster reads
+    
+    The CSV write is confirmed and decides the result. The Parquet copy is
+    best effort: readers fall back to the CSV when it is missing or older.
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+        filename: The CSV file name (e.g., "thorne.csv")
+        df: The DataFrame to store
+        timeout: Seconds to wait for the CSV write to become visible
+    
+    Returns:
+        WriteResult: The outcome of the CSV write
+    """
+    csv_bytes = df.to_csv(index=False).encode()
+    result = upsert_file(build_supabase_path(username, timepoint_id, filename), csv_bytes, "text/csv", timeout)
+    if result.ok and PARQUET_AVAILABLE:
+        try:
+            # Type the frame as CSV readers will see it, so both copies agree
+            buffer = io.BytesIO()
+            _to_columnar(pd.read_csv(io.BytesIO(csv_bytes))).to_parquet(buffer, index=False)
+            upload_file(build_supabase_path(username, timepoint_id, columnar_filename(filename)), buffer.getvalue(), PARQUET_CONTENT_TYPE, upsert=True)
+        except Exception:
+            pass
+    return result
+
+def delete_dataframe(username, timepoint_id, filename, timeout=WRITE_CONFIRM_TIMEOUT_SECONDS):
+    """
+    Remove a stored DataFrame's CSV, its Parquet copy and any raw source payload
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+        filename: The CSV file name (e.g., "thorne.csv")
+        timeout: Seconds to wait for the CSV removal to become visible
+    
+    Returns:
+        WriteResult: The outcome of the CSV removal
+    """
+    result = delete_file(build_supabase_path(username, timepoint_id, filename), timeout)
+    try:
+        remove_files([
+            build_supabase_path(username, timepoint_id, columnar_filename(filename)),
+            build_supabase_path(username, timepoint_id, raw_filename(filename)),
+        ])
+    except Exception:
+        pass
+    return result
+
+def raw_filename(filename):
+    """
+    Get the name of the raw source payload behind a CSV artifact (e.g., "thorne.csv" -> "thorne.raw.json")
+    
+    Args:
+        filename: The CSV file name
+    
+    Returns:
+        str: The raw payload file name
+    """
+    return f"{filename.rsplit('.', 1)[0]}.raw.json"
+
+def upsert_raw_json(username, timepoint_id, filename, payload, timeout=WRITE_CONFIRM_TIMEOUT_SECONDS):
+    """
+    Store the raw source payload a CSV artifact was built from
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+        filename: The CSV file name the payload belongs to (e.g., "thorne.csv")
+        payload: JSON-serializable source data (e.g., the Thorne report)
+        timeout: Seconds to wait for the write to become visible
+    
+    Returns:
+        WriteResult: The outcome of the write
+    """
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return upsert_file(build_supabase_path(username, timepoint_id, raw_filename(filename)), data, RAW_JSON_CONTENT_TYPE, timeout)
+
+def read_raw_json(username, timepoint_id, filename):
+    """
+    Read the raw source payload stored for a CSV artifact
+    
+    Args:
+        username: The username
+        timepoint_id: The timepoint identifier (e.g., "T_01", "T_02")
+        filename: The CSV file name the payload belongs to (e.g., "thorne.csv")
+    
     Returns:
-        The Supabase storage bucket
+        The decoded payload, or None if none is stored
     """
-    user_supabase = get_user_supabase()
-    return user_supabase.storage.from_("data")
+    data = get_if_exists(build_supabase_path(username, timepoint_id, raw_filename(filename)))
+    return None if data is None else json.loads(data)
@@ -0,0 +1,125 @@
+import time
+import asyncio
+import threading
+import importlib.util
+import httpx
+from storage3._async import AsyncStorageClient
+
+# HTTP/2 multiplexes concurrent requests over one connection when the h2
+# package is installed; otherwise requests share a pool of HTTP/1.1 connections.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_CONCURRENCY = 32
+
+class PooledAsyncStorageClient(AsyncStorageClient):
+    """AsyncStorageClient with a bounded, keep-alive connection pool (HTTP/2 when available)."""
+
+    def __init__(self, url, headers, timeout, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        super().__init__(url, headers, timeout)
+
+    def _create_session(self, base_url, headers, timeout):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+
+class ThreadedAsyncBucket:
+    """Async wrapper for a synchronous bucket (e.g. the local backend), running calls in worker threads."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    async def list(self, path=None, options=None):
+        return await asyncio.to_thread(self.bucket.list, path, options)
+
+    async def download(self, path):
+        return await asyncio.to_thread(self.bucket.download, path)
+
+class AsyncStorage:
+    """
+    Asyncio storage layer running on its own event-loop thread.
+
+    Coroutines can be awaited from async code running on the loop, or driven
+    from Streamlit's synchronous scripts with run(). At most max_concurrency
+    requests are in flight at once; the rest wait on a semaphore instead of
+    holding a thread each.
+    """
+
+    def __init__(self, bucket_factory, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-storage", daemon=True)
+        self._thread.start()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = self.run(self._create_bucket(bucket_factory))
+
+    @staticmethod
+    async def _create_bucket(bucket_factory):
+        # Build the HTTP session on the loop that will use it
+        return bucket_factory()
+
+    def run(self, coro, timeout=None):
+        """
+        Run a coroutine on the storage loop and wait for its result
+
+        Args:
+            coro: The coroutine to run
+            timeout: Seconds to wait before giving up (None waits indefinitely)
+
+        Returns:
+            The coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    async def _call(self, op, path, call, recorder):
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                result = await call()
+            except Exception as e:
+                if recorder:
+                    recorder(op, path, 0, time.perf_counter() - started, e)
+                raise
+        if recorder:
+            recorder(op, path, len(result) if isinstance(result, bytes) else len(str(result)), time.perf_counter() - started)
+        return result
+
+    async def download(self, path, recorder=None):
+        """Download one file, reporting it to recorder(op, path, nbytes, elapsed, error) if given."""
+        return await self._call("download", path, lambda: self.bucket.download(path), recorder)
+
+    async def list(self, folder, options=None, recorder=None):
+        """List one folder, reporting it to recorder(op, path, nbytes, elapsed, error) if given."""
+        return await self._call("list", folder, lambda: self.bucket.list(folder, options), recorder)
+
+    async def download_many(self, paths, recorder=None):
+        """
+        Download files concurrently
+
+        Args:
+            paths: Full storage paths
+            recorder: Optional callback reporting each call (see download)
+
+        Returns:
+            dict: Path -> bytes, or the exception raised for that path
+        """
+        results = await asyncio.gather(*(self.download(path, recorder) for path in paths), return_exceptions=True)
+        return dict(zip(paths, results))
+
+    async def list_many(self, folders, options=None, recorder=None):
+        """
+        List folders concurrently
+
+        Args:
+            folders: Folder paths (e.g., "user/T01/")
+            options: Listing options applied to every folder
+            recorder: Optional callback reporting each call (see download)
+
+        Returns:
+            dict: Folder -> list of entries, or the exception raised for that folder
+        """
+        results = await asyncio.gather(*(self.list(folder, options, recorder) for folder in folders), return_exceptions=True)
+        return dict(zip(folders, results))
@@ -0,0 +1,155 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Defaults for the process-wide cache; override with environment variables
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "biosnap_blob_cache")
+DEFAULT_CACHE_MB = 256
+
+class BlobCache:
+    """
+    Size-capped on-disk cache of storage downloads with LRU eviction.
+
+    Entries are keyed by storage path plus a version (ETag or updated_at from
+    the bucket listing), so a changed file is simply a new key and stale
+    entries age out. Safe to share between threads.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Index blobs left by a previous process, oldest access first."""
+        blobs = []
+        for name in os.listdir(self.directory):
+            file_path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                os.remove(file_path)
+                continue
+            stat = os.stat(file_path)
+            blobs.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(blobs):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def _key(path, version):
+        return hashlib.sha256(f"{path}\0{version}".encode("utf-8")).hexdigest()
+
+    def get(self, path, version):
+        """
+        Get cached bytes for a storage path at a given version
+
+        Args:
+            path: The full storage path
+            version: The file version (ETag or updated_at)
+
+        Returns:
+            bytes: The cached contents, or None on a miss
+        """
+        if version is None:
+            return None
+        key = self._key(path, version)
+        file_path = os.path.join(self.directory, key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+            os.utime(file_path)
+        except OSError:
+            with self._lock:
+                self._total_bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, path, version, data):
+        """
+        Store bytes for a storage path at a given version
+
+        Args:
+            path: The full storage path
+            version: The file version (ETag or updated_at)
+            data: The file contents
+        """
+        if version is None or not isinstance(data, bytes) or len(data) > self.max_bytes:
+            return
+        key = self._key(path, version)
+        file_path = os.path.join(self.directory, key)
+        tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used blobs until the cache fits. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: hits, misses, evictions, entries and bytes currently cached
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+_cache_lock = threading.Lock()
+_blob_cache = None
+
+def get_blob_cache():
+    """
+    Get the process-wide blob cache shared by all sessions
+
+    Configured with BIOSNAP_BLOB_CACHE_DIR and BIOSNAP_BLOB_CACHE_MB.
+
+    Returns:
+        BlobCache: The shared cache
+    """
+    global _blob_cache
+    if _blob_cache is None:
+        with _cache_lock:
+            if _blob_cache is None:
+                directory = os.getenv("BIOSNAP_BLOB_CACHE_DIR", DEFAULT_CACHE_DIR)
+                max_mb = float(os.getenv("BIOSNAP_BLOB_CACHE_MB", DEFAULT_CACHE_MB))
+                _blob_cache = BlobCache(directory, int(max_mb * 1024 * 1024))
+    return _blob_cache
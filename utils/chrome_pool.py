@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import atexit
+import signal
+import threading
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from selenium.common.exceptions import WebDriverException
+
+# Defaults for the process-wide pool; override with environment variables
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_USES = 20
+DEFAULT_LEASE_TIMEOUT_SECONDS = 60
+DEFAULT_MAX_LEASE_SECONDS = 180
+DEFAULT_WARM_BROWSERS = 1
+
+# Sites the scrapers log into; their storage is always wiped between leases,
+# along with every other origin a lease requested (see network_events)
+RESET_ORIGINS = [
+    "https://my.functionhealth.com",
+    "https://www.thorne.com",
+]
+
+class ChromePool:
+    """
+    Bounded pool of headless Chrome drivers reused across scrapes.
+
+    At most max_size drivers exist at once. lease() hands out an idle driver
+    (launching one if needed); when all are busy, callers queue in arrival
+    order for up to lease_timeout seconds and are told their queue position.
+    A lease held longer than max_lease_seconds has its browser killed.
+    Between leases each driver's cookies, cache and site storage are wiped so
+    nothing leaks between users, and drivers are quit after max_uses leases
+    or when they break, killing any browser processes left behind.
+    """
+
+    def __init__(self, launch, max_size=DEFAULT_POOL_SIZE, max_uses=DEFAULT_MAX_USES, lease_timeout=DEFAULT_LEASE_TIMEOUT_SECONDS, max_lease_seconds=DEFAULT_MAX_LEASE_SECONDS):
+        self.launch = launch
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self.max_lease_seconds = max_lease_seconds
+        self._admission = threading.Condition()
+        self._active = 0
+        self._waiting = deque()
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._leased = set()
+        self._uses = {}
+        self.launched = 0
+        self.recycled = 0
+        self.expired = 0
+
+    def warm(self, count=DEFAULT_WARM_BROWSERS):
+        """
+        Launch browsers in the background until count are idle
+
+        Args:
+            count: Idle browsers to keep ready
+        """
+        def fill():
+            while True:
+                with self._lock:
+                    if len(self._idle) >= count:
+                        return
+                if not self._try_admit():
+                    return
+                try:
+                    driver = self._launch()
+                    with self._lock:
+                        self._idle.append(driver)
+                except Exception as e:
+                    print(f"Failed to pre-launch browser: {e}")
+                    return
+                finally:
+                    self._leave()
+        threading.Thread(target=fill, name="chrome-pool-warm", daemon=True).start()
+
+    def _try_admit(self):
+        """Take a slot only if one is free and nobody is queued for it."""
+        with self._admission:
+            if self._waiting or self._active >= self.max_size:
+                return False
+            self._active += 1
+            return True
+
+    def _admit(self, timeout, on_wait):
+        """Wait in line for a slot, calling on_wait(position) whenever the queue position changes."""
+        ticket = object()
+        deadline = time.monotonic() + timeout
+        reported = None
+        with self._admission:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    position = self._waiting.index(ticket)
+                    if position == 0 and self._active < self.max_size:
+                        self._waiting.popleft()
+                        self._active += 1
+                        return
+                    if on_wait and position + 1 != reported:
+                        reported = position + 1
+                        on_wait(reported)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("All remote browsers are busy. Please try again in a minute.")
+                    self._admission.wait(remaining)
+            except BaseException:
+                self._waiting.remove(ticket)
+                raise
+            finally:
+                # Wake the next caller in line
+                self._admission.notify_all()
+
+    def _leave(self):
+        with self._admission:
+            self._active -= 1
+            self._admission.notify_all()
+
+    def _launch(self):
+        driver = self.launch()
+        with self._lock:
+            self._uses[id(driver)] = 0
+            self.launched += 1
+        return driver
+
+    @contextmanager
+    def lease(self, timeout=None, on_wait=None):
+        """
+        Borrow a driver for one scrape
+
+        Args:
+            timeout: Seconds to wait for a free browser (defaults to lease_timeout)
+            on_wait: Optional callback receiving the caller's 1-based queue position while waiting
+
+        Yields:
+            WebDriver: A driver with no cookies or site data from earlier leases
+
+        Raises:
+            TimeoutError: If every browser stays busy for the whole timeout, or
+                the lease outlives max_lease_seconds and its browser is killed
+        """
+        self._admit(self.lease_timeout if timeout is None else timeout, on_wait)
+        driver = None
+        healthy = True
+        expired = threading.Event()
+        watchdog = None
+        try:
+            with self._lock:
+                driver = self._idle.popleft() if self._idle else None
+            if driver is None:
+                driver = self._launch()
+            with self._lock:
+                self._leased.add(driver)
+            if self.max_lease_seconds:
+                watchdog = threading.Timer(self.max_lease_seconds, self._expire, (driver, expired))
+                watchdog.daemon = True
+                watchdog.start()
+            yield driver
+        except Exception as e:
+            if isinstance(e, WebDriverException):
+                healthy = False
+            if expired.is_set():
+                raise TimeoutError(f"The remote browser was stopped after {self.max_lease_seconds:g} seconds. Please try again.") from e
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            if driver is not None:
+                with self._lock:
+                    self._leased.discard(driver)
+                # An expired driver was already killed by the watchdog
+                if not expired.is_set():
+                    self._release(driver, healthy)
+            self._leave()
+
+    def _expire(self, driver, expired):
+        """Kill a browser whose lease ran past max_lease_seconds; the scrape using it then fails."""
+        expired.set()
+        print(f"Killing browser leased for more than {self.max_lease_seconds:g} seconds")
+        with self._lock:
+            self.expired += 1
+        self._quit(driver)
+
+    def _release(self, driver, healthy):
+        """Reset a driver and return it to the pool, or quit it if it is spent or broken."""
+        with self._lock:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            spent = self._uses[id(driver)] >= self.max_uses
+        if healthy and not spent:
+            try:
+                reset_driver(driver)
+                with self._lock:
+                    self._idle.append(driver)
+                return
+            except Exception:
+                pass
+        self._quit(driver)
+
+    def _quit(self, driver):
+        with self._lock:
+            if self._uses.pop(id(driver), None) is None:
+                return
+            self.recycled += 1
+        # Note the browser's processes first: once chromedriver exits, Chrome is reparented
+        pid = getattr(getattr(getattr(driver, "service", None), "process", None), "pid", None)
+        pids = process_tree(pid) if pid else []
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        kill_browser_processes(pids)
+
+    def shutdown(self):
+        """Quit every driver, including ones still leased."""
+        with self._lock:
+            drivers = list(self._idle) + list(self._leased)
+            self._idle.clear()
+        for driver in drivers:
+            self._quit(driver)
+
+    def stats(self):
+        """
+        Get pool counters
+
+        Returns:
+            dict: idle, leased and queued callers, plus drivers launched, recycled and expired
+        """
+        with self._admission:
+            waiting = len(self._waiting)
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "leased": len(self._leased),
+                "waiting": waiting,
+                "launched": self.launched,
+                "recycled": self.recycled,
+                "expired": self.expired,
+            }
+
+def process_tree(pid):
+    """
+    Get a process and all its descendants (Linux /proc; just the process elsewhere)
+
+    Args:
+        pid: The root process id
+
+    Returns:
+        list: Process ids, root first
+    """
+    children = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces; fields resume after its closing parenthesis
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return [pid]
+    tree = [pid]
+    for parent in tree:
+        tree.extend(children.get(parent, []))
+    return tree
+
+def kill_browser_processes(pids):
+    """Kill any of the given Chrome/chromedriver processes that are still running."""
+    for pid in pids:
+        try:
+            # Skip ids that exited and were reused by something else
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"chrom" not in f.read().lower():
+                    continue
+        except FileNotFoundError:
+            if os.path.isdir("/proc"):
+                continue
+        except OSError:
+            continue
+        try:
+            os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except (ProcessLookupError, PermissionError):
+            pass
+
+def _origin(url):
+    parsed = urlparse(url or "")
+    return f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme in ("http", "https") and parsed.netloc else None
+
+def network_events(driver):
+    """
+    Drain a driver's performance log, remembering every origin it requested
+
+    Origins (including redirect and SSO hosts) collect on driver.visited_origins
+    until reset_driver clears their storage.
+
+    Args:
+        driver: The Chrome WebDriver (started with performance logging)
+
+    Returns:
+        list: CDP event messages (dicts with method and params)
+    """
+    if getattr(driver, "visited_origins", None) is None:
+        driver.visited_origins = set()
+    messages = []
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        messages.append(message)
+        if message.get("method") == "Network.requestWillBeSent":
+            params = message.get("params") or {}
+            for url in ((params.get("request") or {}).get("url"), params.get("documentURL")):
+                origin = _origin(url)
+                if origin:
+                    driver.visited_origins.add(origin)
+    return messages
+
+def reset_driver(driver):
+    """
+    Wipe a driver's cookies, cache and site storage and leave it on a blank page
+
+    Storage is cleared for every origin the driver requested since its last
+    reset, plus RESET_ORIGINS and the page it ended on.
+
+    Args:
+        driver: The Chrome WebDriver
+    """
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    origins = set(RESET_ORIGINS)
+    current = _origin(driver.current_url)
+    if current:
+        origins.add(current)
+    driver.get("about:blank")
+    try:
+        network_events(driver)
+    except Exception as e:
+        print(f"Could not read visited origins; clearing known sites only: {e}")
+    origins |= getattr(driver, "visited_origins", None) or set()
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+    for origin in origins:
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+    driver.visited_origins = set()
+
+_pool_lock = threading.Lock()
+_chrome_pool = None
+
+def get_chrome_pool(launch):
+    """
+    Get the process-wide Chrome pool, creating it on first use
+
+    Configured with BIOSNAP_CHROME_POOL_SIZE, BIOSNAP_CHROME_MAX_USES,
+    BIOSNAP_CHROME_LEASE_TIMEOUT and BIOSNAP_CHROME_MAX_LEASE_SECONDS.
+
+    Args:
+        launch: Function that starts a new headless Chrome driver
+
+    Returns:
+        ChromePool: The shared pool
+    """
+    global _chrome_pool
+    if _chrome_pool is None:
+        with _pool_lock:
+            if _chrome_pool is None:
+                _chrome_pool = ChromePool(
+                    launch,
+                    max_size=int(os.getenv("BIOSNAP_CHROME_POOL_SIZE", DEFAULT_POOL_SIZE)),
+                    max_uses=int(os.getenv("BIOSNAP_CHROME_MAX_USES", DEFAULT_MAX_USES)),
+                    lease_timeout=float(os.getenv("BIOSNAP_CHROME_LEASE_TIMEOUT", DEFAULT_LEASE_TIMEOUT_SECONDS)),
+                    max_lease_seconds=float(os.getenv("BIOSNAP_CHROME_MAX_LEASE_SECONDS", DEFAULT_MAX_LEASE_SECONDS)),
+                )
+                atexit.register(_chrome_pool.shutdown)
+    return _chrome_pool
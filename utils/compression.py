@@ -0,0 +1,72 @@
+import os
+import gzip
+import importlib.util
+
+# Text artifacts worth compressing; PDFs and Parquet are already compact
+COMPRESSIBLE_CONTENT_TYPES = {"text/csv", "application/json"}
+ENCODED_CONTENT_TYPES = {"gzip": "application/gzip", "zstd": "application/zstd"}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+ZSTD_AVAILABLE = importlib.util.find_spec("zstandard") is not None
+_warned_zstd_missing = False
+
+def get_compression():
+    """
+    Get the configured compression for new uploads
+
+    Set with BIOSNAP_STORAGE_COMPRESSION: "none" (default), "gzip" or "zstd".
+    zstd needs the zstandard package and falls back to gzip without it.
+
+    Returns:
+        str: "gzip", "zstd" or None
+    """
+    global _warned_zstd_missing
+    encoding = os.getenv("BIOSNAP_STORAGE_COMPRESSION", "none").lower()
+    if encoding == "zstd" and not ZSTD_AVAILABLE:
+        if not _warned_zstd_missing:
+            print("zstandard is not installed; compressing storage uploads with gzip")
+            _warned_zstd_missing = True
+        return "gzip"
+    return encoding if encoding in ENCODED_CONTENT_TYPES else None
+
+def compress(data, content_type, encoding=None):
+    """
+    Compress a text payload for upload if compression is enabled
+
+    Args:
+        data: The file contents as bytes
+        content_type: The file's MIME type
+        encoding: "gzip" or "zstd" (defaults to get_compression())
+
+    Returns:
+        tuple: (payload, content type to store); unchanged for other types or when disabled
+    """
+    encoding = encoding or get_compression()
+    if encoding is None or content_type not in COMPRESSIBLE_CONTENT_TYPES:
+        return data, content_type
+    if encoding == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data), ENCODED_CONTENT_TYPES["zstd"]
+    return gzip.compress(data, mtime=0), ENCODED_CONTENT_TYPES["gzip"]
+
+def decompress(data):
+    """
+    Undo compress(), detecting the encoding from the payload's magic bytes
+
+    Uncompressed payloads (including objects stored before compression was
+    enabled) are returned unchanged.
+
+    Args:
+        data: The stored file contents
+
+    Returns:
+        bytes: The original contents
+    """
+    if not isinstance(data, bytes):
+        return data
+    if data.startswith(GZIP_MAGIC):
+        return gzip.decompress(data)
+    if data.startswith(ZSTD_MAGIC):
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
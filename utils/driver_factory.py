@@ -0,0 +1,242 @@
+import os
+import time
+import shutil
+import threading
+import subprocess
+from urllib.parse import urlparse
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from utils.chrome_pool import network_events
+
+# Checked in order when CHROMEDRIVER_PATH / CHROME_BIN are not set
+SYSTEM_CHROMEDRIVER_PATHS = ["/usr/bin/chromedriver", "/usr/lib/chromium/chromedriver"]
+SYSTEM_CHROME_PATHS = ["/usr/bin/chromium", "/usr/bin/chromium-browser", "/usr/bin/google-chrome"]
+CHROME_ARGUMENTS = [
+    "--headless=new",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--window-size=1920x1080",
+]
+
+# Lean profile: resources the scrapers never need (they only use login forms,
+# cookies and the results DOM), blocked unless a site's allowlist keeps them
+BLOCKED_RESOURCES = {
+    "images": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.mov", "*.m3u8", "*.mp3", "*.wav"],
+    "trackers": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*connect.facebook.net*", "*hotjar.com*", "*cdn.segment.com*", "*api.segment.io*",
+        "*fullstory.com*", "*clarity.ms*", "*hs-analytics.net*", "*bat.bing.com*",
+        "*tiktok.com*", "*snap.licdn.com*", "*widget.intercom.io*",
+    ],
+}
+# Host -> resource kinds left unblocked there; extend with BIOSNAP_CHROME_LEAN_ALLOW
+DEFAULT_SITE_ALLOWLIST = {}
+LEAN_PREFS = {
+    "profile.default_content_setting_values.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.geolocation": 2,
+}
+
+_resolve_lock = threading.Lock()
+_preload_started = False
+_driver_path = None
+_options = None
+_stats_lock = threading.Lock()
+_stats = {
+    "resolve_ms": None, "driver_source": None, "created": 0, "failed": 0, "last_ms": None, "max_ms": None, "total_ms": 0.0,
+    "pages": 0, "requests": 0, "blocked": 0, "bytes": 0,
+}
+
+def _find_chromedriver():
+    """Find a usable chromedriver: CHROMEDRIVER_PATH, the system install, then webdriver-manager."""
+    configured = os.getenv("CHROMEDRIVER_PATH")
+    if configured:
+        return configured, "CHROMEDRIVER_PATH"
+    for path in SYSTEM_CHROMEDRIVER_PATHS + [shutil.which("chromedriver")]:
+        if path and os.access(path, os.X_OK):
+            return path, "system"
+    # Last resort: download a matching driver (needs network access)
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install(), "webdriver-manager"
+
+def _validate_chromedriver(path):
+    """Raise if the driver binary is missing or does not run."""
+    if not os.access(path, os.X_OK):
+        raise FileNotFoundError(f"chromedriver not found or not executable: {path}")
+    subprocess.run([path, "--version"], check=True, capture_output=True, timeout=10)
+
+def _find_chrome():
+    """Get the Chrome binary from CHROME_BIN or a system install, or None to let chromedriver decide."""
+    configured = os.getenv("CHROME_BIN")
+    if configured:
+        return configured
+    for path in SYSTEM_CHROME_PATHS:
+        if os.access(path, os.X_OK):
+            return path
+    return None
+
+def lean_enabled():
+    """Whether drivers use the lean profile (BIOSNAP_CHROME_LEAN, on by default)."""
+    return os.getenv("BIOSNAP_CHROME_LEAN", "1").lower() not in ("0", "false", "no", "off")
+
+def site_allowlist():
+    """
+    Get the resource kinds each site may still load under the lean profile
+
+    BIOSNAP_CHROME_LEAN_ALLOW adds entries, e.g. "www.thorne.com=fonts,images;my.functionhealth.com=trackers".
+
+    Returns:
+        dict: Host -> set of kinds from BLOCKED_RESOURCES
+    """
+    allowlist = {host: set(kinds) for host, kinds in DEFAULT_SITE_ALLOWLIST.items()}
+    for entry in os.getenv("BIOSNAP_CHROME_LEAN_ALLOW", "").split(";"):
+        host, _, kinds = entry.partition("=")
+        if host.strip():
+            allowlist.setdefault(host.strip(), set()).update(kind.strip() for kind in kinds.split(",") if kind.strip())
+    return allowlist
+
+def _lean_options(options):
+    """Block images and prompts through Chrome preferences."""
+    prefs = dict(LEAN_PREFS)
+    # Content-setting exceptions let allowlisted sites keep their images
+    image_sites = [host for host, kinds in site_allowlist().items() if "images" in kinds]
+    if image_sites:
+        prefs["profile.content_settings.exceptions.images"] = {f"https://{host},*": {"setting": 1} for host in image_sites}
+    options.add_experimental_option("prefs", prefs)
+
+def start_lean_page(driver, url):
+    """
+    Block unneeded resources for the site a scrape is about to open and start counting its traffic
+
+    Does nothing when the lean profile is off.
+
+    Args:
+        driver: The Chrome WebDriver
+        url: Any URL on the site (its host picks the allowlist)
+    """
+    if not lean_enabled():
+        return
+    allowed = site_allowlist().get(urlparse(url).netloc, set())
+    patterns = [pattern for kind, kind_patterns in BLOCKED_RESOURCES.items() if kind not in allowed for pattern in kind_patterns]
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    # Drain events from earlier leases so lean_page_stats covers this scrape only
+    network_events(driver)
+
+def lean_page_stats(driver):
+    """
+    Count the requests, blocked requests and bytes downloaded since start_lean_page
+
+    Compare runs with BIOSNAP_CHROME_LEAN=0 to see the bytes and time saved.
+
+    Args:
+        driver: The Chrome WebDriver
+
+    Returns:
+        dict: requests, blocked and bytes, or None when the lean profile is off
+    """
+    if not lean_enabled():
+        return None
+    stats = {"requests": 0, "blocked": 0, "bytes": 0}
+    for message in network_events(driver):
+        method = message.get("method")
+        params = message.get("params") or {}
+        if method == "Network.requestWillBeSent":
+            stats["requests"] += 1
+        elif method == "Network.loadingFinished":
+            stats["bytes"] += int(params.get("encodedDataLength") or 0)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            stats["blocked"] += 1
+    with _stats_lock:
+        _stats["pages"] += 1
+        for key, value in stats.items():
+            _stats[key] += value
+    return stats
+
+def resolve_driver():
+    """
+    Resolve and validate the chromedriver binary and Chrome options once per process
+
+    Later calls return the cached result immediately.
+
+    Returns:
+        tuple: (chromedriver path, Options)
+    """
+    global _driver_path, _options
+    if _driver_path is None:
+        with _resolve_lock:
+            if _driver_path is None:
+                started = time.perf_counter()
+                path, source = _find_chromedriver()
+                _validate_chromedriver(path)
+                options = Options()
+                for argument in CHROME_ARGUMENTS:
+                    options.add_argument(argument)
+                # The performance log records the origins each lease visits (see network_events)
+                options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+                if lean_enabled():
+                    _lean_options(options)
+                chrome = _find_chrome()
+                if chrome:
+                    options.binary_location = chrome
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                with _stats_lock:
+                    _stats["resolve_ms"] = elapsed_ms
+                    _stats["driver_source"] = source
+                print(f"Using chromedriver {path} ({source}), Chrome {chrome or 'default'}; resolved in {elapsed_ms} ms")
+                _options = options
+                _driver_path = path
+    return _driver_path, _options
+
+def preload_driver():
+    """Resolve the driver in the background so the first scrape does not pay for it (once per process)."""
+    global _preload_started
+    with _resolve_lock:
+        if _preload_started or _driver_path is not None:
+            return
+        _preload_started = True
+    def resolve():
+        try:
+            resolve_driver()
+        except Exception as e:
+            print(f"Failed to resolve chromedriver: {e}")
+    threading.Thread(target=resolve, name="driver-resolve", daemon=True).start()
+
+def create_driver():
+    """
+    Start a headless Chrome driver from the resolved binary and options
+
+    Returns:
+        WebDriver: The new driver
+    """
+    path, options = resolve_driver()
+    started = time.perf_counter()
+    try:
+        # A Service owns one chromedriver process, so each driver gets its own
+        driver = webdriver.Chrome(service=Service(path), options=options)
+    except Exception:
+        with _stats_lock:
+            _stats["failed"] += 1
+        raise
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    with _stats_lock:
+        _stats["created"] += 1
+        _stats["last_ms"] = elapsed_ms
+        _stats["max_ms"] = max(_stats["max_ms"] or 0, elapsed_ms)
+        _stats["total_ms"] += elapsed_ms
+    return driver
+
+def driver_stats():
+    """
+    Get driver resolution and creation timings
+
+    Returns:
+        dict: resolve_ms, driver_source, created, failed, last_ms, max_ms and
+            total_ms, plus lean-profile scrapes (pages) with their requests,
+            blocked requests and bytes downloaded
+    """
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Default memory budget for the process-wide cache; override with environment variables
+DEFAULT_FRAME_CACHE_MB = 128
+
+class FrameCache:
+    """
+    In-memory cache of parsed DataFrames shared by all sessions.
+
+    Keys are (username, timepoint, artifact, version) tuples. Entries are
+    evicted least recently used first once their combined memory use passes
+    the budget. Cached frames are shared, so callers must not modify them in
+    place.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+    def get(self, key):
+        """
+        Get a cached frame
+
+        Args:
+            key: (username, timepoint, artifact, version)
+
+        Returns:
+            DataFrame: The cached frame, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, df):
+        """
+        Cache a parsed frame
+
+        Args:
+            key: (username, timepoint, artifact, version)
+            df: The parsed DataFrame
+        """
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (df, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, username, timepoint, artifact):
+        """
+        Drop every cached version of an artifact
+
+        Args:
+            username: The username
+            timepoint: The timepoint folder (e.g., "T01")
+            artifact: The file name (e.g., "thorne.csv")
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[:3] == (username, timepoint, artifact)]:
+                self._total_bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: hits, misses, evictions, entries and bytes currently cached
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+_cache_lock = threading.Lock()
+_frame_cache = None
+
+def get_frame_cache():
+    """
+    Get the process-wide DataFrame cache shared by all sessions
+
+    Configured with BIOSNAP_FRAME_CACHE_MB.
+
+    Returns:
+        FrameCache: The shared cache
+    """
+    global _frame_cache
+    if _frame_cache is None:
+        with _cache_lock:
+            if _frame_cache is None:
+                max_mb = float(os.getenv("BIOSNAP_FRAME_CACHE_MB", DEFAULT_FRAME_CACHE_MB))
+                _frame_cache = FrameCache(int(max_mb * 1024 * 1024))
+    return _frame_cache
@@ -0,0 +1,156 @@
+import os
+import time
+import random
+import hashlib
+import mimetypes
+from datetime import datetime, timezone
+from storage3.utils import StorageException
+
+# Defaults for the local backend; override with environment variables
+DEFAULT_LOCAL_STORAGE_DIR = "local_storage"
+
+class LocalStorageBucket:
+    """
+    Drop-in stand-in for a Supabase storage bucket backed by a local directory.
+
+    Implements the list/download/upload/remove surface the tabs use, with the
+    same metadata shape and StorageException errors, plus optional per-call
+    latency, jitter and failure injection for profiling renders offline.
+    """
+
+    def __init__(self, root, latency_ms=0, jitter_ms=0, failure_rate=0.0, seed=None):
+        self.root = os.path.abspath(root)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _simulate_network(self, operation, path):
+        """Sleep for the configured latency and maybe raise an injected failure."""
+        delay_ms = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise StorageException({
+                "statusCode": 503,
+                "error": "Service Unavailable",
+                "message": f"Injected failure in {operation} for {path}",
+            })
+
+    def _full_path(self, path):
+        full_path = os.path.abspath(os.path.join(self.root, path.strip("/")))
+        if os.path.commonpath([self.root, full_path]) != self.root:
+            raise StorageException({"statusCode": 400, "error": "Invalid key", "message": path})
+        return full_path
+
+    @staticmethod
+    def _timestamp(seconds):
+        return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+    def _file_entry(self, name, full_path):
+        stat = os.stat(full_path)
+        modified = self._timestamp(stat.st_mtime)
+        return {
+            "name": name,
+            "id": hashlib.md5(full_path.encode("utf-8")).hexdigest(),
+            "updated_at": modified,
+            "created_at": self._timestamp(stat.st_ctime),
+            "last_accessed_at": modified,
+            "metadata": {
+                "eTag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+                "size": stat.st_size,
+                "mimetype": mimetypes.guess_type(name)[0] or "application/octet-stream",
+                "cacheControl": "max-age=3600",
+                "lastModified": modified,
+                "contentLength": stat.st_size,
+                "httpStatusCode": 200,
+            },
+        }
+
+    @staticmethod
+    def _folder_entry(name):
+        return {"name": name, "id": None, "updated_at": None, "created_at": None, "last_accessed_at": None, "metadata": None}
+
+    def list(self, path=None, options=None):
+        """List files and folders directly under a folder, like SyncBucketProxy.list."""
+        self._simulate_network("list", path or "")
+        options = options or {}
+        folder = self._full_path(path or "")
+        if not os.path.isdir(folder):
+            return []
+        search = options.get("search", "")
+        entries = []
+        for name in os.listdir(folder):
+            if search and search not in name:
+                continue
+            full_path = os.path.join(folder, name)
+            if name.endswith(".tmp"):
+                continue
+            if os.path.isdir(full_path):
+                entries.append(self._folder_entry(name))
+            else:
+                entries.append(self._file_entry(name, full_path))
+        sort_by = options.get("sortBy") or {}
+        column = sort_by.get("column", "name")
+        entries.sort(key=lambda e: e.get(column) or "", reverse=sort_by.get("order") == "desc")
+        offset = int(options.get("offset", 0))
+        limit = int(options.get("limit", 100))
+        return entries[offset:offset + limit]
+
+    def download(self, path, options=None):
+        """Return a file's bytes, raising StorageException if it does not exist."""
+        self._simulate_network("download", path)
+        full_path = self._full_path(path)
+        if not os.path.isfile(full_path):
+            raise StorageException({"statusCode": 404, "error": "not_found", "message": "Object not found"})
+        with open(full_path, "rb") as f:
+            return f.read()
+
+    def upload(self, path, file, file_options=None):
+        """Write a file, refusing to overwrite unless the x-upsert option is "true"."""
+        self._simulate_network("upload", path)
+        file_options = file_options or {}
+        full_path = self._full_path(path)
+        if os.path.exists(full_path) and str(file_options.get("x-upsert", "false")).lower() != "true":
+            raise StorageException({"statusCode": 409, "error": "Duplicate", "message": "The resource already exists"})
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as f:
+                file = f.read()
+        elif hasattr(file, "read"):
+            file = file.read()
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f"{full_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(file)
+        os.replace(tmp_path, full_path)
+        return {"Key": f"data/{path}", "path": path}
+
+    def remove(self, paths):
+        """Delete files, returning the entries that existed."""
+        self._simulate_network("remove", ",".join(paths))
+        removed = []
+        for path in paths:
+            full_path = self._full_path(path)
+            if os.path.isfile(full_path):
+                removed.append(self._file_entry(os.path.basename(path), full_path))
+                os.remove(full_path)
+        return removed
+
+def get_local_bucket():
+    """
+    Build a local bucket from environment variables
+
+    BIOSNAP_LOCAL_STORAGE_DIR sets the directory; BIOSNAP_FAKE_LATENCY_MS,
+    BIOSNAP_FAKE_JITTER_MS and BIOSNAP_FAKE_FAILURE_RATE shape the simulated
+    network.
+
+    Returns:
+        LocalStorageBucket: The local bucket
+    """
+    return LocalStorageBucket(
+        os.getenv("BIOSNAP_LOCAL_STORAGE_DIR", DEFAULT_LOCAL_STORAGE_DIR),
+        latency_ms=float(os.getenv("BIOSNAP_FAKE_LATENCY_MS", 0)),
+        jitter_ms=float(os.getenv("BIOSNAP_FAKE_JITTER_MS", 0)),
+        failure_rate=float(os.getenv("BIOSNAP_FAKE_FAILURE_RATE", 0)),
+    )
@@ -0,0 +1,156 @@
+"""
+Rebuild derived CSV/Parquet artifacts from the raw source payloads stored next to them
+
+Run after changing a transform (e.g., thorne_report_to_dataframe) so every
+participant's data picks it up without logging in to the source again:
+
+    python -m utils.reprocess_raw [--users alice,bob] [--workers 8] [--dry-run]
+"""
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from supabase_utils import build_supabase_path, download_many, list_many, raw_filename, upsert_dataframe
+from utils.thorne_report import thorne_report_to_dataframe
+
+# CSV artifact -> function building it from its raw payload
+RAW_TRANSFORMS = {
+    "thorne.csv": thorne_report_to_dataframe,
+}
+DEFAULT_WORKERS = 8
+LIST_LIMIT = 1000
+
+def _folders(entries):
+    # Folder entries have no object id
+    return [entry["name"] for entry in entries if entry.get("id") is None and entry.get("name")]
+
+def _list_all(folders):
+    """
+    List folders in full, paging through any with more than LIST_LIMIT entries
+
+    Args:
+        folders: Folder paths (e.g., "alice/")
+
+    Returns:
+        tuple: (folder -> list of entries, folders whose listing failed)
+    """
+    listings = {folder: [] for folder in folders}
+    failed = []
+    pending = list(folders)
+    offset = 0
+    while pending:
+        pages = list_many(pending, {"limit": LIST_LIMIT, "offset": offset, "sortBy": {"column": "name", "order": "asc"}})
+        failed.extend(folder for folder in pending if folder not in pages)
+        for folder, entries in pages.items():
+            listings[folder].extend(entries)
+        # A full page means the folder may have more entries
+        pending = [folder for folder, entries in pages.items() if len(entries) == LIST_LIMIT]
+        offset += LIST_LIMIT
+    for folder in failed:
+        del listings[folder]
+    return listings, failed
+
+def find_raw_payloads(usernames=None):
+    """
+    Find every stored raw payload that has a transform
+
+    Args:
+        usernames: Users to look at (defaults to every top-level folder)
+
+    Returns:
+        tuple: (list of (username, timepoint, CSV file name) tuples, folders whose listing failed)
+    """
+    failed = []
+    if usernames is None:
+        root, failed = _list_all([""])
+        usernames = _folders(root.get("", []))
+    user_listings, user_failed = _list_all([f"{username}/" for username in usernames])
+    timepoint_folders = [f"{folder}{name}/" for folder, entries in user_listings.items() for name in _folders(entries)]
+    timepoint_listings, timepoint_failed = _list_all(timepoint_folders)
+    raw_names = {raw_filename(filename): filename for filename in RAW_TRANSFORMS}
+    found = []
+    for folder, entries in timepoint_listings.items():
+        username, timepoint = folder.rstrip("/").split("/")
+        for entry in entries:
+            if entry.get("name") in raw_names:
+                found.append((username, timepoint, raw_names[entry["name"]]))
+    return sorted(found), failed + user_failed + timepoint_failed
+
+def reprocess(username, timepoint, filename, data, dry_run=False):
+    """
+    Rebuild one artifact from its raw payload
+
+    Args:
+        username: The username
+        timepoint: The timepoint folder (e.g., "T01")
+        filename: The CSV file name (e.g., "thorne.csv")
+        data: The raw payload bytes
+        dry_run: Transform without writing anything
+
+    Returns:
+        str: None on success, else an error message
+    """
+    try:
+        df = RAW_TRANSFORMS[filename](json.loads(data))
+    except Exception as e:
+        return f"transform failed: {type(e).__name__}: {e}"
+    if dry_run:
+        return None
+    result = upsert_dataframe(username, timepoint, filename, df)
+    return None if result.ok else f"upload failed: {result.error}"
+
+def reprocess_all(usernames=None, workers=DEFAULT_WORKERS, dry_run=False):
+    """
+    Rebuild every artifact that has a stored raw payload
+
+    Payloads are downloaded concurrently in batches and transformed and
+    uploaded on a pool of worker threads.
+
+    Args:
+        usernames: Users to reprocess (defaults to everyone)
+        workers: Artifacts processed at once
+        dry_run: Transform without writing anything
+
+    Returns:
+        dict: (username, timepoint, filename) -> None on success, else an error
+            message; a folder that could not be listed is keyed by (folder,)
+    """
+    started = time.perf_counter()
+    targets, failed_folders = find_raw_payloads(usernames)
+    print(f"Found {len(targets)} raw payloads in {time.perf_counter() - started:.1f}s")
+    results = {}
+    # Payloads in a folder that could not be listed were never found; count the folder as failed
+    for folder in failed_folders:
+        results[(folder or "/",)] = "listing failed"
+        print(f"{folder or '/'}: listing failed")
+    batch_size = max(workers * 4, 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reprocess") as executor:
+        for start in range(0, len(targets), batch_size):
+            batch = targets[start:start + batch_size]
+            paths = {target: build_supabase_path(target[0], target[1], raw_filename(target[2])) for target in batch}
+            payloads = download_many(paths.values())
+            futures = {}
+            for target, path in paths.items():
+                if path not in payloads:
+                    results[target] = "download failed"
+                    continue
+                futures[target] = executor.submit(reprocess, *target, payloads[path], dry_run)
+            for target, future in futures.items():
+                results[target] = future.result()
+                print(f"{'/'.join(target)}: {results[target] or 'ok'}")
+    failed = sum(error is not None for error in results.values())
+    print(f"Reprocessed {len(results) - failed} of {len(results)} artifacts in {time.perf_counter() - started:.1f}s ({failed} failed)")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild derived CSV/Parquet artifacts from stored raw payloads.")
+    parser.add_argument("--users", help="Comma-separated usernames (default: everyone)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Artifacts processed at once (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--dry-run", action="store_true", help="Transform without writing anything")
+    args = parser.parse_args()
+    usernames = [name.strip() for name in args.users.split(",") if name.strip()] if args.users else None
+    results = reprocess_all(usernames, workers=args.workers, dry_run=args.dry_run)
+    return 1 if any(error is not None for error in results.values()) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,267 @@
+import os
+import math
+import time
+import uuid
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Defaults for the process-wide runner; override with environment variables.
+# Workers outnumber the browser pool (see chrome_pool) so a burst of imports
+# reaches the pool's queue, where each is told its place in line.
+DEFAULT_SCRAPE_WORKERS = 8
+DEFAULT_JOB_RETENTION_SECONDS = 30 * 60
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 5 * 60
+# Finished jobs whose run times feed the queue ETA
+RECENT_DURATIONS = 20
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    """Raised inside a job's worker when the job was cancelled."""
+
+class ScrapeJob:
+    """
+    One scrape running (or waiting to run) on the background worker pool.
+
+    The job is passed to the scrape function as its status: every progress
+    step calls report(), which records an event for the tab to poll and is
+    where a cancelled job stops. The scrape's return value (or exception)
+    is kept for the tab to pick up once the job finishes.
+    """
+
+    def __init__(self, owner, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.label = label
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._events = []
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def report(self, message):
+        """
+        Record a progress step
+
+        Args:
+            message: Short description of the step starting now
+
+        Raises:
+            JobCancelled: If the job has been cancelled
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(f"{self.label} was cancelled")
+        with self._lock:
+            self._events.append((time.time(), message))
+
+    def events(self):
+        """
+        Get the progress events so far
+
+        Returns:
+            list: (timestamp, message) tuples, oldest first
+        """
+        with self._lock:
+            return list(self._events)
+
+    def cancel(self):
+        """Stop the job: a queued job never starts, a running one stops at its next step."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+
+    def _finish(self, state, result=None, error=None):
+        with self._lock:
+            self.state = state
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+
+class ScrapeJobRunner:
+    """
+    Bounded worker pool that runs scrapes off the Streamlit script thread.
+
+    Jobs are looked up by id or by owner (e.g., "user:thorne:T01"), so a
+    refreshed page can pick up a job started by an earlier session. Jobs
+    waiting for a worker are told their place in line and fail after
+    queue_timeout seconds. Finished jobs are dropped after retention seconds.
+    """
+
+    def __init__(self, max_workers=DEFAULT_SCRAPE_WORKERS, retention=DEFAULT_JOB_RETENTION_SECONDS, queue_timeout=DEFAULT_QUEUE_TIMEOUT_SECONDS):
+        self.max_workers = max_workers
+        self.retention = retention
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._durations = deque(maxlen=RECENT_DURATIONS)
+
+    def submit(self, owner, label, fn, *args, **kwargs):
+        """
+        Queue a scrape, cancelling any unfinished job with the same owner
+
+        Args:
+            owner: Key identifying who the job is for
+            label: Name shown to the user (e.g., "Thorne import")
+            fn: The scrape function; called as fn(*args, status=job, **kwargs)
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            ScrapeJob: The queued job
+        """
+        self._expire_queued()
+        previous = self.find(owner)
+        if previous is not None and not previous.finished:
+            previous.cancel()
+        job = ScrapeJob(owner, label)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job._finish(CANCELLED)
+            return
+        job.state = RUNNING
+        job.started_at = time.time()
+        try:
+            result = fn(*args, status=job, **kwargs)
+        except JobCancelled as e:
+            job._finish(CANCELLED, error=e)
+        except Exception as e:
+            print(f"{job.label} job {job.id} failed: {type(e).__name__}: {e}")
+            job._finish(FAILED, error=e)
+        else:
+            job._finish(CANCELLED if job.cancel_requested else DONE, result=result)
+            with self._lock:
+                self._durations.append(job.finished_at - job.started_at)
+
+    def get(self, job_id):
+        """Get a job by id, or None if it is unknown or expired."""
+        self._expire_queued()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        """
+        Get a queued job's place in line for a worker
+
+        Args:
+            job: The ScrapeJob
+
+        Returns:
+            int: 1-based position, or None if the job is not waiting for a worker
+        """
+        with self._lock:
+            queued = sorted((other for other in self._jobs.values() if other.state == QUEUED and not other.cancel_requested), key=lambda other: other.created_at)
+        return queued.index(job) + 1 if job in queued else None
+
+    def queue_eta(self, position):
+        """
+        Estimate how long a queued job waits for a worker
+
+        Args:
+            position: The job's place in line (see queue_position)
+
+        Returns:
+            float: Seconds, or None before any job has finished
+        """
+        with self._lock:
+            if not self._durations:
+                return None
+            average = sum(self._durations) / len(self._durations)
+        # Every worker frees up once per average run, so each round serves max_workers jobs
+        return math.ceil(position / self.max_workers) * average
+
+    def _expire_queued(self):
+        """Fail jobs that waited for a worker longer than queue_timeout."""
+        if not self.queue_timeout:
+            return
+        cutoff = time.time() - self.queue_timeout
+        with self._lock:
+            overdue = [job for job in self._jobs.values() if job.state == QUEUED and job.created_at < cutoff]
+        for job in overdue:
+            if job._future is not None and job._future.cancel():
+                job._finish(FAILED, error=TimeoutError(f"Every import slot stayed busy for {self.queue_timeout:g} seconds. Please try again in a few minutes."))
+
+    def find(self, owner):
+        """Get the most recent job for an owner, or None."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return max(jobs, key=lambda job: job.created_at) if jobs else None
+
+    def discard(self, job_id):
+        """Forget a job once its result has been handed off."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        """
+        Get job counts by state
+
+        Returns:
+            dict: State -> number of jobs
+        """
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
+
+    def shutdown(self):
+        """Cancel every job and stop the workers."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=False)
+
+_runner_lock = threading.Lock()
+_scrape_jobs = None
+
+def get_scrape_jobs():
+    """
+    Get the process-wide scrape job runner, creating it on first use
+
+    Configured with BIOSNAP_SCRAPE_WORKERS and BIOSNAP_SCRAPE_QUEUE_TIMEOUT.
+
+    Returns:
+        ScrapeJobRunner: The shared runner
+    """
+    global _scrape_jobs
+    if _scrape_jobs is None:
+        with _runner_lock:
+            if _scrape_jobs is None:
+                _scrape_jobs = ScrapeJobRunner(
+                    max_workers=int(os.getenv("BIOSNAP_SCRAPE_WORKERS", DEFAULT_SCRAPE_WORKERS)),
+                    queue_timeout=float(os.getenv("BIOSNAP_SCRAPE_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT_SECONDS)),
+                )
+                atexit.register(_scrape_jobs.shutdown)
+    return _scrape_jobs
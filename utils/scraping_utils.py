@@ -1,25 +1,213 @@
+import os
 import time
 import pandas as pd
 import streamlit as st
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import requests
-import html
-from bs4 import BeautifulSoup
 import re
 import threading
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from contextlib import contextmanager
+from utils.chrome_pool import get_chrome_pool
+from utils.driver_factory import create_driver, lean_page_stats, start_lean_page
+from utils.scrape_jobs import ScrapeJob
+from utils.thorne_report import thorne_report_to_dataframe
 
 # Default timezone for date formatting (matches common UI expectations)
 LOCAL_TZ = "US/Eastern"
 
+# Upper bounds for waiting on the remote sites
+PAGE_TIMEOUT_SECONDS = 15
+LOGIN_TIMEOUT_SECONDS = 15
+
+class ScrapeSteps:
+    """
+    Shows scrape progress in a status placeholder (or reports it to a
+    background ScrapeJob) and times each step.
+
+    Calling the object starts a new step (ending the previous one). A step
+    can carry a latency budget; finish() prints every step's time and flags
+    steps that went over budget.
+    """
+
+    def __init__(self, status, source):
+        self.status = status
+        self.source = source
+        self.timings = {}
+        self.network = None
+        self._budgets = {}
+        self._current = None
+        self._started = time.perf_counter()
+        self._step_started = self._started
+
+    def __call__(self, message, budget=None):
+        self._end_step()
+        self._current = message
+        self._budgets[message] = budget
+        self._step_started = time.perf_counter()
+        if isinstance(self.status, ScrapeJob):
+            # Background jobs record the step for the tab to poll (and stop here if cancelled)
+            self.status.report(message)
+        elif self.status:
+            self.status.markdown(
+                f'<div style="margin-left:2.0em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ {message}</div>',
+                unsafe_allow_html=True
+            )
+
+    def _end_step(self):
+        if self._current is not None:
+            self.timings[self._current] = round(time.perf_counter() - self._step_started, 3)
+            self._current = None
+
+    def finish(self):
+        """
+        End the last step and print the timings
+
+        Returns:
+            dict: Step message -> seconds, plus "total"
+        """
+        self._end_step()
+        self.timings["total"] = round(time.perf_counter() - self._started, 3)
+        report = []
+        for message, seconds in self.timings.items():
+            budget = self._budgets.get(message)
+            flag = f" (over {budget}s budget)" if budget and seconds > budget else ""
+            report.append(f"{message}: {seconds:.2f}s{flag}")
+        print(f"{self.source} scrape timings: " + "; ".join(report))
+        if self.network:
+            print(f"{self.source} scrape network: {self.network['requests']} requests, {self.network['blocked']} blocked, {self.network['bytes'] / 1024:.0f} KB downloaded")
+        return self.timings
+
+# Reads every biomarker row from the Function Health page in one round trip.
+# Mirrors the row rules of the old per-element walk: h4 headings set the
+# category, containers without a name are skipped, one to three result values
+# map to value / status, value / status, value, units, and a unit element wins.
+FUNCTION_HEALTH_EXTRACT_JS = """
+const text = el => (el && el.getClientRects().length) ? el.innerText.trim() : "";
+const nodes = document.evaluate(
+    "//h4 | //div[contains(@class, 'biomarkerResult-styled__ResultContainer')]",
+    document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+);
+const rows = [];
+let category = null;
+for (let i = 0; i < nodes.snapshotLength; i++) {
+    const el = nodes.snapshotItem(i);
+    if (el.tagName.toLowerCase() === "h4") {
+        category = text(el);
+        continue;
+    }
+    const nameEl = el.querySelector("[class^='biomarkerResultRow-styled__BiomarkerName']");
+    if (!nameEl) continue;
+    const texts = Array.from(el.querySelectorAll("[class*='biomarkerChart-styled__ResultValue']")).map(text);
+    let status = "", value = "", units = "";
+    if (texts.length === 3) [status, value, units] = texts;
+    else if (texts.length === 2) [status, value] = texts;
+    else if (texts.length === 1) value = texts[0];
+    const unitEl = el.querySelector("[class^='biomarkerChart-styled__UnitValue']");
+    if (unitEl) units = text(unitEl);
+    rows.push({category: category, name: text(nameEl), status: status, value: value, units: units});
+}
+return rows;
+"""
+
+# Function Health results over HTTP. The app's JSON endpoint is not
+# documented, so it is configured with FUNCTION_HEALTH_RESULTS_URL (and
+# optionally FUNCTION_HEALTH_TOKEN_KEY, the storage key of the app's access
+# token). Without it, or if the response yields no rows, the page is read.
+# A signed JWT: base64url JSON header and payload ("eyJ" is '{"'), then the signature
+JWT_PATTERN = re.compile(r"eyJ[\w-]+\.eyJ[\w-]+\.[\w-]+")
+FUNCTION_HEALTH_NAME_KEYS = ("name", "biomarkerName", "displayName", "title")
+FUNCTION_HEALTH_VALUE_KEYS = ("value", "displayValue", "resultValue", "result")
+FUNCTION_HEALTH_STATUS_KEYS = ("status", "rangeStatus", "resultStatus", "flag")
+FUNCTION_HEALTH_UNIT_KEYS = ("units", "unit", "unitOfMeasure")
+FUNCTION_HEALTH_CATEGORY_KEYS = ("category", "categoryName", "group", "groupName")
+
+def function_health_auth(driver):
+    """
+    Collect the logged-in browser session's cookies and access token
+
+    Args:
+        driver: A WebDriver logged into Function Health
+
+    Returns:
+        tuple: (cookies dict, bearer token or None)
+    """
+    cookies = {c["name"]: c["value"] for c in driver.get_cookies()}
+    storage = driver.execute_script("return Object.assign({}, window.sessionStorage, window.localStorage);") or {}
+    token_key = os.getenv("FUNCTION_HEALTH_TOKEN_KEY")
+    if token_key:
+        return cookies, storage.get(token_key)
+    token = next((v for v in storage.values() if isinstance(v, str) and JWT_PATTERN.fullmatch(v)), None)
+    return cookies, token
+
+def _first(item, keys):
+    for key in keys:
+        value = item.get(key)
+        if value not in (None, "") and not isinstance(value, (dict, list)):
+            return str(value).strip()
+    return ""
+
+def function_health_rows(payload, category=None):
+    """
+    Turn a Function Health results payload into scrape rows
+
+    Walks the JSON for objects that have both a name and a value, taking the
+    category from the nearest enclosing object that names one.
+
+    Args:
+        payload: Parsed JSON from the results endpoint
+        category: Category inherited from an enclosing object
+
+    Returns:
+        list: Dicts with category, name, status, value and units
+    """
+    rows = []
+    if isinstance(payload, list):
+        for item in payload:
+            rows.extend(function_health_rows(item, category))
+    elif isinstance(payload, dict):
+        category = _first(payload, FUNCTION_HEALTH_CATEGORY_KEYS) or category
+        name = _first(payload, FUNCTION_HEALTH_NAME_KEYS)
+        value = _first(payload, FUNCTION_HEALTH_VALUE_KEYS)
+        if name and value:
+            rows.append({
+                "category": category,
+                "name": name,
+                "status": _first(payload, FUNCTION_HEALTH_STATUS_KEYS),
+                "value": value,
+                "units": _first(payload, FUNCTION_HEALTH_UNIT_KEYS),
+            })
+        else:
+            for key, child in payload.items():
+                if isinstance(child, (dict, list)):
+                    rows.extend(function_health_rows(child, category))
+    return rows
+
+def fetch_function_health_results(url, cookies, token=None):
+    """
+    Fetch biomarker rows from the Function Health JSON API
+
+    Args:
+        url: The results endpoint (FUNCTION_HEALTH_RESULTS_URL)
+        cookies: Session cookies from the logged-in browser
+        token: Bearer token from the logged-in browser, if any
+
+    Returns:
+        list: Rows as returned by function_health_rows
+    """
+    headers = {"Accept": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    with requests.Session() as session:
+        session.cookies.update(cookies)
+        resp = session.get(url, headers=headers, timeout=PAGE_TIMEOUT_SECONDS)
+        resp.raise_for_status()
+        return function_health_rows(resp.json())
+
 def local_label(ts_utc_str, tz=LOCAL_TZ):
     """Convert UTC timestamp to local date in mm/dd/yyyy format."""
     dt = datetime.fromisoformat(ts_utc_str.replace("Z", "+00:00")).astimezone(ZoneInfo(tz))
@@ -50,557 +238,274 @@ def choose_report_by_created_date(reports, target_local_date):
     # If more than one report shares the same local date, take the newest createdTimestamp
     return idx[target_local_date][0], target_local_date
 
-def fetch_all_thorne_reports(cookies):
-    """Fetch all Gut Health reports from the Thorne API."""
-    url = "https://www.thorne.com/account/data/tests/reports/GUTHEALTH/details"
-    r = requests.get(url, cookies=cookies, headers={"Accept": "application/json"})
-    r.raise_for_status()
-    data = r.json() or []
-    # Some responses come as dict-with-list; normalize to list of reports
-    if isinstance(data, dict) and "reports" in data:
-        data = data["reports"]
-    return data
+# How long a Thorne login stays usable between listing tests and importing one
+THORNE_SESSION_TTL_SECONDS = 15 * 60
 
-def update_progress(status, bar, message, percent):
-    if status:
-        status.write(message)
-    if bar:
-        bar.progress(percent)
+class ThorneSessionExpired(Exception):
+    """Raised when a ThorneSession is used after it expired or was closed."""
 
-def scrape_function_health(user_email, user_pass, status=None):
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--window-size=1920x1080")
-    try:
-        service = Service(ChromeDriverManager().install())
-    except Exception:
-        service = Service("/usr/bin/chromedriver")
-        options.add_argument("--binary=/usr/bin/chromium")
-    driver = None
-    data = []
-    def update_status(message):
-        status.markdown(
-            f'<div style="margin-left:2.0em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ {message}</div>',
-            unsafe_allow_html=True
-        )
-    try:
-        update_status("Launching remote browser")
-        driver = webdriver.Chrome(service=service, options=options)
-        time.sleep(1)
-        update_status("Accessing Function Health")
-        driver.get("https://my.functionhealth.com/")
-        driver.maximize_window()
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "email"))
-        ).send_keys(user_email)
-        update_status("Logging into Function Health")
-        driver.find_element(By.ID, "password").send_keys(user_pass + Keys.RETURN)
-        time.sleep(5)
-        if "login" in driver.current_url.lower():
-            raise ValueError("Login failed — please check your Function Health credentials.")
-        update_status("Importing biomarkers")
-        driver.get("https://my.functionhealth.com/biomarkers")
-        WebDriverWait(driver, 12).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "[class^='biomarkerResultRow-styled__BiomarkerName']"))
-        )
-        everything = driver.find_elements(By.XPATH, "//h4 | //div[contains(@class, 'biomarkerResult-styled__ResultContainer')]")
-        current_category = None
-        total = len(everything)
-        for i, el in enumerate(everything):
-            tag = el.tag_name
-            if tag == "h4":
-                current_category = el.text.strip()
-            elif tag == "div":
-                try:
-                    name = el.find_element(By.CSS_SELECTOR, "[class^='biomarkerResultRow-styled__BiomarkerName']").text.strip()
-                    status_text = value = units = ""
-                    values = el.find_elements(By.CSS_SELECTOR, "[class*='biomarkerChart-styled__ResultValue']")
-                    texts = [v.text.strip() for v in values]
-                    if len(texts) == 3:
-                        status_text, value, units = texts
-                    elif len(texts) == 2:
-                        status_text, value = texts
-                    elif len(texts) == 1:
-                        value = texts[0]
-                    try:
-                        unit_el = el.find_element(By.CSS_SELECTOR, "[class^='biomarkerChart-styled__UnitValue']")
-                        units = unit_el.text.strip()
-                    except:
-                        pass
-                    data.append({
-                        "category": current_category,
-                        "name": name,
-                        "status": status_text,
-                        "value": value,
-                        "units": units
-                    })
-                except Exception:
-                    continue
-        update_status("Closing remote browser")
-        driver.quit()
-        time.sleep(1)
-        update_status("Cleaning data")
-        time.sleep(1)
-    except Exception as e:
-        if driver:
-            driver.quit()
-        raise e
-    return pd.DataFrame(data)
-
-def scrape_thorne_gut_report(user_email, user_pass, status=None):
-    import streamlit as st
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--window-size=1920x1080")
-    try:
-        service = Service(ChromeDriverManager().install())
-    except Exception:
-        service = Service("/usr/bin/chromedriver")
-        options.add_argument("--binary=/usr/bin/chromium")
-    driver = None
-    def update_status(message):
-        status.markdown(
-            f'<div style="margin-left:2.0em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ {message}</div>',
-            unsafe_allow_html=True
-        )
-    try:
-        update_status("Launching remote browser")
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.get("https://www.thorne.com/login")
-        wait = WebDriverWait(driver, 15)
-        update_status("Logging into Thorne")
-        wait.until(EC.element_to_be_clickable((By.NAME, "email"))).send_keys(user_email)
-        wait.until(EC.element_to_be_clickable((By.NAME, "password"))).send_keys(user_pass + Keys.RETURN)
-        try:
-            wait.until(lambda d: "/login" not in d.current_url)
-        except Exception:
-            raise ValueError("Login failed — please check your Thorne credentials.")
-        time.sleep(0.5)
-        update_status("Navigating to Gut Health test")
-        driver.get("https://www.thorne.com/account/tests")
-        wait.until(EC.element_to_be_clickable((By.LINK_TEXT, "View Results"))).click()
-        wait.until(EC.url_contains("/account/tests/GUTHEALTH/"))
-        update_status("Extracting session data")
-        for popup_text in ["×", "Got it"]:
-            try:
-                wait.until(EC.element_to_be_clickable((By.XPATH, f"//button[contains(., '{popup_text}')]"))).click()
-            except:
-                pass
-        cookies = {c["name"]: c["value"] for c in driver.get_cookies()}
-        update_status("Closing remote browser")
-        driver.quit()
-        
-        # Fetch the most recent report
-        update_status("Fetching report data")
-        all_reports = fetch_all_thorne_reports(cookies)
-        report, _ = choose_report_by_created_date(all_reports, None)  # None gets most recent
-        
-        update_status("Processing report data")
-    except Exception as e:
-        if driver:
-            driver.quit()
-        raise e
-    rows = []
-    for sec in report.get("bodySections", []):
-        results = sec.get("results") or []
-        if not results:
-            continue
-        
-        # Find insights section
-        insp = next(
-            (s for s in report["bodySections"]
-             if s.get("anchorId") == sec.get("anchorId", "").replace("_markers", "_insights")),
-            {}
-        )
-        insights_html = insp.get("content", "").strip()
-        
-        # Find section summary/range text
-        summary_html = pick_section_summary(results)
-        
-        # Look for composite-like item
-        sec_title_norm = (sec.get("title") or "").strip().lower()
-        comp = next((r for r in results if is_composite_like(r, sec_title_norm)), None)
-        
-        # Section header row
-        if comp:
-            rows.append({
-                "section":       sec.get("title", ""),
-                "item":          "Composite",
-                "score":         comp.get("valueNumeric", comp.get("value")),
-                "risk":          comp.get("riskClassification", ""),
-                "optimal_range": summary_html,
-                "insights":      insights_html
-            })
-        else:
-            rows.append({
-                "section":       sec.get("title", ""),
-                "item":          "",      
-                "score":         "",    
-                "risk":          "",      
-                "optimal_range": summary_html,
-                "insights":      insights_html
-            })
-        
-        # Child microbes
-        for it in results:
-            if comp is not None and it is comp:
-                continue
-            name = (it.get("title") or it.get("name") or "").strip()
-            if not name:
-                continue
-            rows.append({
-                "section":       sec.get("title", ""),
-                "item":          name,
-                "score":         it.get("valueNumeric", it.get("value")),
-                "risk":          it.get("riskClassification", ""),
-                "optimal_range": None,
-                "insights":      ""
-            })
-    df = pd.DataFrame(rows)
-    
-    # Post-processing and cleanup
-    df = (
-        df.rename(columns={
-            'section': 'Category',
-            'item': 'Microbe',
-            'optimal_range': 'Summary',
-            'insights': 'Insights',
-            'score': 'Score',
-            'risk': 'Risk'
-        })
-        .assign(
-            Risk=lambda x: x['Risk'].str.title() if x['Risk'].dtype == 'object' else x['Risk']
-        )
-    )
-    # Deduplicate Insights: only keep the first non-empty per Category
-    df['Insights'] = df.groupby('Category')['Insights'] \
-                       .transform(lambda grp: grp.where(grp.ne('').cumsum() <= 1, ''))
-    # Cleaning function: un-escape entities, strip citations, remove HTML tags
-    def clean_text(text):
-        if not text:
-            return ''
-        text = html.unescape(text)
-        text = re.sub(r'<div class="references".*$', '', text, flags=re.DOTALL)
-        text = BeautifulSoup(text, 'html.parser').get_text(separator=' ')
-        return re.sub(r'\s+', ' ', text).strip()
-    for col in ['Insights', 'Summary']:
-        df[col] = df[col].apply(clean_text)
-    # Clear Summary for non-summary categories
-    valid_categories = [
-        'Digestion', 'Inflammation', 'Gut Dysbiosis',
-        'Intestinal Permeability', 'Nervous System',
-        'Diversity Score', 'Immune Readiness Score',
-        'Pathogens'
-    ]
-    df.loc[~df['Category'].isin(valid_categories), 'Summary'] = ''
-    return df
+class ThorneSession:
+    """
+    Logged-in Thorne API session kept in memory between import steps.
 
+    Holds the login cookies in a requests.Session (never the password), so
+    listing tests and importing one share a single browser login. It stops
+    working after ttl seconds or once close() is called.
+    """
 
-def get_thorne_available_tests(user_email, user_pass, status=None):
-    """Get available Thorne Gut Health test dates for selection using API."""
-    from datetime import datetime
-    
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--window-size=1920x1080")
-
-    try:
-        service = Service(ChromeDriverManager().install())
-    except Exception:
-        service = Service("/usr/bin/chromedriver")
-        options.add_argument("--binary=/usr/bin/chromium")
+    def __init__(self, cookies, ttl=THORNE_SESSION_TTL_SECONDS):
+        self.session = requests.Session()
+        self.session.cookies.update(cookies)
+        self.session.headers["Accept"] = "application/json"
+        self.expires_at = time.monotonic() + ttl
 
-    driver = None
+    @property
+    def expired(self):
+        return self.session is None or time.monotonic() >= self.expires_at
 
-    def update_status(message):
-        if status:
-            status.markdown(
-                f'<div style="margin-left:2.0em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ {message}</div>',
-                unsafe_allow_html=True
-            )
+    def get_json(self, url):
+        """
+        GET a Thorne JSON endpoint with the session's cookies
 
-    try:
-        update_status("Launching remote browser")
-        driver = webdriver.Chrome(service=service, options=options)
-        wait = WebDriverWait(driver, 15)
+        Args:
+            url: The endpoint URL
 
-        # Log in
-        update_status("Logging into Thorne")
-        driver.get("https://www.thorne.com/login")
-        wait.until(EC.element_to_be_clickable((By.NAME, "email"))).send_keys(user_email)
-        wait.until(EC.element_to_be_clickable((By.NAME, "password"))).send_keys(user_pass + Keys.RETURN)
-        
-        try:
-            wait.until(lambda d: "/login" not in d.current_url)
-        except Exception:
-            raise ValueError("Login failed — please check your Thorne credentials.")
-
-        # Get session cookies for API calls
-        update_status("Fetching available Gut Health tests")
-        cookies = {c["name"]: c["value"] for c in driver.get_cookies()}
-        
-        update_status("Closing remote browser")
-        driver.quit()
-        
-        # Use API to get test data
-        resp = requests.get(
-            "https://www.thorne.com/account/data/tests",
-            cookies=cookies,
-            headers={"Accept": "application/json"}
-        )
+        Returns:
+            The parsed JSON response
+        """
+        if self.expired:
+            raise ThorneSessionExpired("Your Thorne session has expired. Please log in again.")
+        resp = self.session.get(url, timeout=PAGE_TIMEOUT_SECONDS)
         resp.raise_for_status()
-        all_tests = resp.json()
-        
-        # Filter for completed Gut Health tests only
-        gut_health_tests = []
-        for test in all_tests:
-            if (test.get("packageIdentifier") == "GUTHEALTH" and 
-                test.get("completed") == True and 
-                test.get("completedTimestamp")):
-                
-                # Format the completion date
-                try:
-                    formatted_date = local_label(test["completedTimestamp"])
-                    label = f"Gut Health Test - Completed on {formatted_date}"
-                except Exception:
-                    label = f"Gut Health Test - Completed on {test.get('completedTimestamp', 'Unknown date')}"
-                
-                gut_health_tests.append({
-                    "id": test["id"],
-                    "label": label, 
-                    "date": test["completedTimestamp"],
-                    "local_date": formatted_date,
-                    "packageName": test.get("packageName", "Gut Health Test")
-                })
-        
-        # Sort by completion date (newest first)
-        gut_health_tests.sort(key=lambda x: x["date"], reverse=True)
-        
-        return gut_health_tests
+        return resp.json()
 
-    except Exception as e:
-        if driver:
-            driver.quit()
-        raise e
+    def close(self):
+        """Drop the cookies and close pooled connections."""
+        if self.session is not None:
+            self.session.cookies.clear()
+            self.session.close()
+            self.session = None
 
+def fetch_all_thorne_reports(thorne_session):
+    """Fetch all Gut Health reports from the Thorne API."""
+    url = "https://www.thorne.com/account/data/tests/reports/GUTHEALTH/details"
+    data = thorne_session.get_json(url) or []
+    # Some responses come as dict-with-list; normalize to list of reports
+    if isinstance(data, dict) and "reports" in data:
+        data = data["reports"]
+    return data
 
-def is_number(val):
-    """Check if a value is numeric."""
-    if val is None:
-        return False
-    try:
-        float(val)
-        return True
-    except (ValueError, TypeError):
-        return False
-
-def is_composite_like(item, sec_title_norm):
-    """Check if an item represents a composite/section score."""
-    title = (item.get("title") or item.get("name") or "").strip()
-    content = (item.get("content") or "")
-    val = item.get("valueNumeric", item.get("value"))
-
-    has_value = (val is not None) and (str(val).strip() != "")
-    is_num = False
-    try:
-        float(val)
-        is_num = True
-    except Exception:
-        pass
+def chrome_pool():
+    """Get the shared pool of headless browsers used by the scrapers."""
+    return get_chrome_pool(create_driver)
 
-    looks_summary = bool(re.search(r"(optimal range|reference range|your .* score)", content, re.I))
-    title_is_score = bool(re.search(r"\bscore\b", title, re.I))
+@contextmanager
+def lease_browser(steps, site_url):
+    """
+    Borrow a pooled browser for one site, showing the user's place in line while every browser is busy
 
-    # NEW: title matches section title and has any value (numeric or text)
-    title_matches_section = title.strip().lower() == sec_title_norm
+    The browser blocks resources the site does not need (see start_lean_page)
+    and its traffic is recorded on steps.network.
 
-    return (
-        (title == "" and (is_num or looks_summary)) or
-        (title_is_score and is_num) or
-        (title_matches_section and has_value)
-    )
+    Args:
+        steps: The scrape's ScrapeSteps
+        site_url: Any URL on the site being scraped
 
-def pick_section_summary(results):
-    """Find the first content snippet that contains a range."""
-    for it in results:
-        c = it.get("content") or ""
-        if re.search(r"(optimal range|reference range)", c, re.I):
-            return c
-        if re.search(r"[≤≥<>]?\s*\d+(?:\.\d+)?\s*(–|-|to)\s*[≤≥<>]?\s*\d+(?:\.\d+)?", c):
-            return c
-    # fallback: any "*Score" item's content
-    for it in results:
-        t = it.get("title") or it.get("name") or ""
-        if "score" in t.lower() and it.get("content"):
-            return it["content"]
-    return ""
+    Yields:
+        WebDriver: The leased driver (see ChromePool.lease)
+    """
+    with chrome_pool().lease(on_wait=lambda position: steps(f"Waiting for a free remote browser (position {position} in line)")) as driver:
+        try:
+            start_lean_page(driver, site_url)
+        except Exception as e:
+            print(f"Lean browser profile not applied: {e}")
+        try:
+            yield driver
+        finally:
+            try:
+                steps.network = lean_page_stats(driver)
+            except Exception:
+                pass
+
+def warm_browsers():
+    """Pre-launch a browser in the background so the next import starts immediately."""
+    chrome_pool().warm()
 
-def scrape_thorne_gut_report_by_date(user_email, user_pass, target_local_date, status=None):
-    """Scrape Thorne Gut Health report data for a specific date."""
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--window-size=1920x1080")
+def update_progress(status, bar, message, percent):
+    if status:
+        status.write(message)
+    if bar:
+        bar.progress(percent)
 
+def _login_function_health(driver, user_email, user_pass, steps):
+    """Log a leased driver into Function Health, raising ValueError on bad credentials."""
+    steps("Accessing Function Health", budget=PAGE_TIMEOUT_SECONDS)
+    driver.get("https://my.functionhealth.com/")
+    driver.maximize_window()
+    WebDriverWait(driver, PAGE_TIMEOUT_SECONDS).until(
+        EC.presence_of_element_located((By.ID, "email"))
+    ).send_keys(user_email)
+    steps("Logging into Function Health", budget=LOGIN_TIMEOUT_SECONDS)
+    driver.find_element(By.ID, "password").send_keys(user_pass + Keys.RETURN)
+    # Logged in once the login form is gone and the URL has moved on
     try:
-        service = Service(ChromeDriverManager().install())
+        WebDriverWait(driver, LOGIN_TIMEOUT_SECONDS).until(
+            lambda d: "login" not in d.current_url.lower() and not d.find_elements(By.ID, "password")
+        )
     except Exception:
-        service = Service("/usr/bin/chromedriver")
-        options.add_argument("--binary=/usr/bin/chromium")
-
-    driver = None
+        raise ValueError("Login failed — please check your Function Health credentials.")
+
+def _function_health_page_rows(driver, steps):
+    """Read the biomarker rows from the rendered results page of a logged-in driver."""
+    steps("Importing biomarkers from page", budget=PAGE_TIMEOUT_SECONDS)
+    driver.get("https://my.functionhealth.com/biomarkers")
+    WebDriverWait(driver, PAGE_TIMEOUT_SECONDS).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "[class^='biomarkerResultRow-styled__BiomarkerName']"))
+    )
+    return driver.execute_script(FUNCTION_HEALTH_EXTRACT_JS)
 
-    def update_status(message):
-        if status:
-            status.markdown(
-                f'<div style="margin-left:2.0em; font-size:1rem; font-weight:400; line-height:1.2; margin-top:-0.6em; margin-bottom:0.1em;">⤷ {message}</div>',
-                unsafe_allow_html=True
-            )
+def scrape_function_health(user_email, user_pass, status=None):
+    steps = ScrapeSteps(status, "Function Health")
+    api_url = os.getenv("FUNCTION_HEALTH_RESULTS_URL")
+    data = []
+    auth = None
+    steps("Launching remote browser")
+    with lease_browser(steps, "https://my.functionhealth.com/") as driver:
+        _login_function_health(driver, user_email, user_pass, steps)
+        if api_url:
+            # Only the login needs the browser; hand it back before calling the API
+            steps("Extracting session data")
+            try:
+                auth = function_health_auth(driver)
+            except Exception as e:
+                print(f"Function Health session data unavailable, reading the page instead: {e}")
+        if auth is None:
+            data = _function_health_page_rows(driver, steps)
+        steps("Closing remote browser")
+    if auth is not None:
+        steps("Importing biomarkers", budget=PAGE_TIMEOUT_SECONDS)
+        try:
+            data = fetch_function_health_results(api_url, *auth)
+        except Exception as e:
+            print(f"Function Health API import failed, reading the page instead: {e}")
+        if not data:
+            # Fall back to the page, which needs a fresh browser and login
+            steps("Relaunching remote browser")
+            with lease_browser(steps, "https://my.functionhealth.com/") as driver:
+                _login_function_health(driver, user_email, user_pass, steps)
+                data = _function_health_page_rows(driver, steps)
+                steps("Closing relaunched browser")
+    steps("Cleaning data")
+    df = pd.DataFrame(data, columns=["category", "name", "status", "value", "units"])
+    df.attrs["step_timings"] = steps.finish()
+    return df
 
-    try:
-        update_status("Launching remote browser")
-        driver = webdriver.Chrome(service=service, options=options)
-        wait = WebDriverWait(driver, 15)
+def login_thorne(user_email, user_pass, status=None):
+    """Log into Thorne in a pooled browser and return a ThorneSession holding its cookies."""
+    steps = ScrapeSteps(status, "Thorne login")
+    steps("Launching remote browser")
+    with lease_browser(steps, "https://www.thorne.com/") as driver:
+        wait = WebDriverWait(driver, PAGE_TIMEOUT_SECONDS)
 
         # Log in
-        update_status("Logging into Thorne")
+        steps("Logging into Thorne", budget=LOGIN_TIMEOUT_SECONDS)
         driver.get("https://www.thorne.com/login")
         wait.until(EC.element_to_be_clickable((By.NAME, "email"))).send_keys(user_email)
         wait.until(EC.element_to_be_clickable((By.NAME, "password"))).send_keys(user_pass + Keys.RETURN)
-
+        
         try:
-            wait.until(lambda d: "/login" not in d.current_url)
+            WebDriverWait(driver, LOGIN_TIMEOUT_SECONDS).until(lambda d: "/login" not in d.current_url)
         except Exception:
             raise ValueError("Login failed — please check your Thorne credentials.")
 
         # Navigate to tests page to establish session
-        update_status("Opening Gut Health tests")
+        steps("Opening Gut Health tests", budget=PAGE_TIMEOUT_SECONDS)
         driver.get("https://www.thorne.com/account/tests")
 
-        # Get session cookies for API call
-        update_status("Extracting session data")
+        # Get session cookies for API calls
+        steps("Extracting session data")
         cookies = {c["name"]: c["value"] for c in driver.get_cookies()}
-
-        update_status("Closing remote browser")
-        driver.quit()
-
-        # Fetch all reports and select the specific one by date
-        update_status("Fetching all report data")
-        all_reports = fetch_all_thorne_reports(cookies)
         
-        update_status("Selecting report by date")
-        report, selected_date = choose_report_by_created_date(all_reports, target_local_date)
-        
-        update_status(f"Processing report from {selected_date}")
-
-    except Exception as e:
-        if driver:
-            driver.quit()
-        raise e
+        steps("Closing remote browser")
+    steps.finish()
+    return ThorneSession(cookies)
 
-    # Process the report data
-    rows = []
-    for sec in report.get("bodySections", []):
-        results = sec.get("results") or []
-        if not results:
-            continue
-        
-        # Find insights section
-        insp = next(
-            (s for s in report["bodySections"]
-             if s.get("anchorId") == sec.get("anchorId", "").replace("_markers", "_insights")),
-            {}
-        )
-        insights_html = insp.get("content", "").strip()
-        
-        # Find section summary/range text
-        summary_html = pick_section_summary(results)
-        
-        # Look for composite-like item
-        sec_title_norm = (sec.get("title") or "").strip().lower()
-        comp = next((r for r in results if is_composite_like(r, sec_title_norm)), None)
-        
-        # Add section header row
-        if comp:
-            rows.append({
-                "section":       sec.get("title", ""),
-                "item":          "Composite",
-                "score":         comp.get("valueNumeric", comp.get("value")),
-                "risk":          comp.get("riskClassification", ""),
-                "optimal_range": summary_html,
-                "insights":      insights_html
-            })
-        else:
-            rows.append({
-                "section":       sec.get("title", ""),
-                "item":          "",      
-                "score":         "",    
-                "risk":          "",      
-                "optimal_range": summary_html,
-                "insights":      insights_html
-            })
-        
-        # Child microbes
-        for it in results:
-            if comp is not None and it is comp:
-                continue
-            name = (it.get("title") or it.get("name") or "").strip()
-            if not name:
-                continue
-            rows.append({
-                "section":       sec.get("title", ""),
-                "item":          name,
-                "score":         it.get("valueNumeric", it.get("value")),
-                "risk":          it.get("riskClassification", ""),
-                "optimal_range": None,
-                "insights":      ""
+def get_thorne_available_tests(thorne_session, status=None):
+    """Get available Thorne Gut Health test dates for selection using API."""
+    from datetime import datetime
+    
+    steps = ScrapeSteps(status, "Thorne tests")
+    steps("Fetching available Gut Health tests")
+    all_tests = thorne_session.get_json("https://www.thorne.com/account/data/tests")
+    
+    # Filter for completed Gut Health tests only
+    gut_health_tests = []
+    for test in all_tests:
+        if (test.get("packageIdentifier") == "GUTHEALTH" and 
+            test.get("completed") == True and 
+            test.get("completedTimestamp")):
+            
+            # Format the completion date
+            try:
+                formatted_date = local_label(test["completedTimestamp"])
+                label = f"Gut Health Test - Completed on {formatted_date}"
+            except Exception:
+                label = f"Gut Health Test - Completed on {test.get('completedTimestamp', 'Unknown date')}"
+            
+            gut_health_tests.append({
+                "id": test["id"],
+                "label": label, 
+                "date": test["completedTimestamp"],
+                "local_date": formatted_date,
+                "packageName": test.get("packageName", "Gut Health Test")
             })
+    
+    # Sort by completion date (newest first)
+    gut_health_tests.sort(key=lambda x: x["date"], reverse=True)
+    steps.finish()
+    
+    return gut_health_tests
 
-    df = pd.DataFrame(rows)
-
-    # Cleaning/post-processing logic
-    df = (
-        df.rename(columns={
-            'section': 'Category',
-            'item': 'Microbe',
-            'optimal_range': 'Summary',
-            'insights': 'Insights',
-            'score': 'Score',
-            'risk': 'Risk'
-        })
-        .assign(
-            Risk=lambda x: x['Risk'].str.title() if x['Risk'].dtype == 'object' else x['Risk']
-        )
-    )
 
-    # Deduplicate Insights: only keep the first non-empty per Category
-    df['Insights'] = df.groupby('Category')['Insights']                        .transform(lambda grp: grp.where(grp.ne('').cumsum() <= 1, ''))
-
-    # Cleaning function: un-escape entities, strip citations, remove HTML tags
-    def clean_text(text):
-        if not text:
-            return ''
-        text = html.unescape(text)
-        text = re.sub(r'<div class="references".*$', '', text, flags=re.DOTALL)
-        text = BeautifulSoup(text, 'html.parser').get_text(separator=' ')
-        return re.sub(r'\s+', ' ', text).strip()
-
-    for col in ['Insights', 'Summary']:
-        df[col] = df[col].apply(clean_text)
-
-    # Clear Summary for non-summary categories
-    valid_categories = [
-        'Digestion', 'Inflammation', 'Gut Dysbiosis',
-        'Intestinal Permeability', 'Nervous System',
-        'Diversity Score', 'Immune Readiness Score',
-        'Pathogens'
-    ]
-    df.loc[~df['Category'].isin(valid_categories), 'Summary'] = ''
-    return df
+def connect_thorne(user_email, user_pass, status=None):
+    """
+    Log into Thorne and list the available Gut Health tests
+
+    Args:
+        user_email: Thorne account email
+        user_pass: Thorne account password
+        status: Streamlit placeholder or ScrapeJob for progress
+
+    Returns:
+        tuple: (ThorneSession, list of tests); the session is already closed when there are no tests
+    """
+    thorne_session = login_thorne(user_email, user_pass, status)
+    try:
+        available_tests = get_thorne_available_tests(thorne_session, status)
+    except Exception:
+        thorne_session.close()
+        raise
+    if not available_tests:
+        thorne_session.close()
+    return thorne_session, available_tests
+
+def scrape_thorne_gut_report_by_date(thorne_session, target_local_date, status=None):
+    """
+    Fetch Thorne Gut Health report data for a specific date using a logged-in ThorneSession
+
+    Returns:
+        tuple: (DataFrame from thorne_report_to_dataframe, the raw report it was built from)
+    """
+    steps = ScrapeSteps(status, "Thorne")
+
+    # Fetch all reports and select the specific one by date
+    steps("Fetching all report data")
+    all_reports = fetch_all_thorne_reports(thorne_session)
+    
+    steps("Selecting report by date")
+    report, selected_date = choose_report_by_created_date(all_reports, target_local_date)
+    
+    steps(f"Processing report from {selected_date}")
+    df = thorne_report_to_dataframe(report)
+    df.attrs["step_timings"] = steps.finish()
+    return df, report
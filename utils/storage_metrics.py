@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Reruns kept per session for the diagnostics panel
+DEFAULT_RERUN_HISTORY = 20
+
+# Session stats and tab for the rerun running on this thread
+_current_stats = ContextVar("storage_stats", default=None)
+_current_tab = ContextVar("storage_tab", default=None)
+_log_lock = threading.Lock()
+
+class StorageStats:
+    """
+    Storage calls made by one Streamlit session, grouped by rerun.
+
+    Keeps every call of the current rerun, running per-tab/per-operation
+    totals for the session and a short history of per-rerun summaries.
+    """
+
+    def __init__(self, history=DEFAULT_RERUN_HISTORY):
+        self.session_id = uuid.uuid4().hex[:8]
+        self.rerun = 0
+        self._lock = threading.Lock()
+        self._calls = []
+        self._totals = defaultdict(lambda: {"calls": 0, "errors": 0, "bytes": 0, "ms": 0.0})
+        self._history = deque(maxlen=history)
+
+    def start_rerun(self):
+        """Close the current rerun and start collecting a new one."""
+        with self._lock:
+            if self._calls:
+                self._history.append(self._summarize(self.rerun, self._calls))
+            self.rerun += 1
+            self._calls = []
+
+    @staticmethod
+    def _summarize(rerun, calls):
+        return {
+            "rerun": rerun,
+            "calls": len(calls),
+            "errors": sum(not call["ok"] for call in calls),
+            "bytes": sum(call["bytes"] for call in calls),
+            "ms": round(sum(call["ms"] for call in calls), 1),
+        }
+
+    def add(self, call):
+        """Record one storage call (see record_call)."""
+        with self._lock:
+            call["session"] = self.session_id
+            call["rerun"] = self.rerun
+            self._calls.append(call)
+            totals = self._totals[(call["tab"], call["op"])]
+            totals["calls"] += 1
+            totals["errors"] += not call["ok"]
+            totals["bytes"] += call["bytes"]
+            totals["ms"] += call["ms"]
+
+    def current_rerun(self):
+        """
+        Get the calls made so far in this rerun
+
+        Returns:
+            list: One dict per call (op, path, tab, bytes, ms, ok, ...)
+        """
+        with self._lock:
+            return list(self._calls)
+
+    def session_totals(self):
+        """
+        Get the session's totals per tab and operation, slowest first
+
+        Returns:
+            list: One dict per (tab, op) with calls, errors, bytes and ms
+        """
+        with self._lock:
+            rows = [{"tab": tab, "op": op, **totals, "ms": round(totals["ms"], 1)} for (tab, op), totals in self._totals.items()]
+        return sorted(rows, key=lambda row: row["ms"], reverse=True)
+
+    def recent_reruns(self):
+        """
+        Get summaries of recent reruns, including the current one
+
+        Returns:
+            list: One dict per rerun with calls, errors, bytes and ms
+        """
+        with self._lock:
+            return list(self._history) + [self._summarize(self.rerun, self._calls)]
+
+def use_stats(stats):
+    """
+    Attribute storage calls made on this thread to a session's stats
+
+    Args:
+        stats: The session's StorageStats
+    """
+    _current_stats.set(stats)
+
+@contextmanager
+def storage_tab(name):
+    """
+    Attribute storage calls made inside the block to a tab
+
+    Args:
+        name: The tab label (e.g., "Thorne Overview")
+    """
+    token = _current_tab.set(name)
+    try:
+        yield
+    finally:
+        _current_tab.reset(token)
+
+def bind_recorder():
+    """
+    Capture the current session and tab for calls completed on another thread
+
+    Returns:
+        function: record(op, path, nbytes, elapsed, error=None) bound to them
+    """
+    stats = _current_stats.get()
+    tab = _current_tab.get()
+    def record(op, path, nbytes, elapsed, error=None):
+        _record(stats, tab, op, path, nbytes, elapsed, error)
+    return record
+
+def record_call(op, path, nbytes, elapsed, error=None):
+    """
+    Record a storage call for the current session and tab
+
+    Args:
+        op: The operation ("list", "download", "upload" or "remove")
+        path: The storage path or folder
+        nbytes: Bytes transferred (file size, or listing size for list)
+        elapsed: Seconds the call took
+        error: The exception raised, if the call failed
+    """
+    _record(_current_stats.get(), _current_tab.get(), op, path, nbytes, elapsed, error)
+
+def _record(stats, tab, op, path, nbytes, elapsed, error):
+    call = {
+        "ts": round(time.time(), 3),
+        "op": op,
+        "path": path,
+        "tab": tab,
+        "bytes": nbytes,
+        "ms": round(elapsed * 1000, 1),
+        "ok": error is None,
+        "error": None if error is None else str(error),
+        "session": None,
+        "rerun": None,
+    }
+    if stats is not None:
+        stats.add(call)
+    log_path = os.getenv("BIOSNAP_STORAGE_LOG")
+    if log_path:
+        with _log_lock:
+            with open(log_path, "a") as f:
+                f.write(json.dumps(call) + "\n")
+
+def _payload_size(result):
+    """Approximate bytes for a call's response."""
+    if isinstance(result, bytes):
+        return len(result)
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+class InstrumentedBucket:
+    """
+    Wraps a storage bucket so list/download/upload/remove calls are recorded.
+
+    Other attributes pass through to the wrapped bucket unchanged.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def __getattr__(self, name):
+        return getattr(self.bucket, name)
+
+    def _timed(self, op, path, call, sent=0):
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            record_call(op, path, sent, time.perf_counter() - started, e)
+            raise
+        record_call(op, path, sent or _payload_size(result), time.perf_counter() - started)
+        return result
+
+    def list(self, path=None, options=None):
+        return self._timed("list", path or "", lambda: self.bucket.list(path, options))
+
+    def download(self, path, *args, **kwargs):
+        return self._timed("download", path, lambda: self.bucket.download(path, *args, **kwargs))
+
+    def upload(self, path, file, file_options=None):
+        sent = len(file) if isinstance(file, (bytes, str)) else 0
+        return self._timed("upload", path, lambda: self.bucket.upload(path=path, file=file, file_options=file_options), sent)
+
+    def remove(self, paths):
+        return self._timed("remove", ",".join(paths), lambda: self.bucket.remove(paths))
@@ -0,0 +1,148 @@
+"""
+Turn Thorne Gut Health reports into tables
+
+Pure functions with no browser or Streamlit dependencies, shared by the
+scrapers and the offline reprocessor (utils/reprocess_raw.py).
+"""
+import re
+import html
+from functools import lru_cache
+import pandas as pd
+from bs4 import BeautifulSoup
+
+def is_number(val):
+    """Check if a value is numeric."""
+    if val is None:
+        return False
+    try:
+        float(val)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+def is_composite_like(item, sec_title_norm):
+    """Check if an item represents a composite/section score."""
+    title = (item.get("title") or item.get("name") or "").strip()
+    content = (item.get("content") or "")
+    val = item.get("valueNumeric", item.get("value"))
+
+    has_value = (val is not None) and (str(val).strip() != "")
+    is_num = False
+    try:
+        float(val)
+        is_num = True
+    except Exception:
+        pass
+
+    looks_summary = bool(re.search(r"(optimal range|reference range|your .* score)", content, re.I))
+    title_is_score = bool(re.search(r"\bscore\b", title, re.I))
+
+    # NEW: title matches section title and has any value (numeric or text)
+    title_matches_section = title.strip().lower() == sec_title_norm
+
+    return (
+        (title == "" and (is_num or looks_summary)) or
+        (title_is_score and is_num) or
+        (title_matches_section and has_value)
+    )
+
+def pick_section_summary(results):
+    """Find the first content snippet that contains a range."""
+    for it in results:
+        c = it.get("content") or ""
+        if re.search(r"(optimal range|reference range)", c, re.I):
+            return c
+        if re.search(r"[≤≥<>]?\s*\d+(?:\.\d+)?\s*(–|-|to)\s*[≤≥<>]?\s*\d+(?:\.\d+)?", c):
+            return c
+    # fallback: any "*Score" item's content
+    for it in results:
+        t = it.get("title") or it.get("name") or ""
+        if "score" in t.lower() and it.get("content"):
+            return it["content"]
+    return ""
+
+# Categories whose section summary (range text) is kept in the Summary column
+THORNE_SUMMARY_CATEGORIES = [
+    'Digestion', 'Inflammation', 'Gut Dysbiosis',
+    'Intestinal Permeability', 'Nervous System',
+    'Diversity Score', 'Immune Readiness Score',
+    'Pathogens'
+]
+THORNE_COLUMNS = ['Category', 'Microbe', 'Score', 'Risk', 'Summary', 'Insights']
+REFERENCES_PATTERN = re.compile(r'<div class="references".*$', flags=re.DOTALL)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+@lru_cache(maxsize=4096)
+def clean_text(text):
+    """Un-escape entities, strip citations and remove HTML tags (memoized: report sections repeat the same fragments)."""
+    if not text:
+        return ''
+    text = html.unescape(text)
+    text = REFERENCES_PATTERN.sub('', text)
+    text = BeautifulSoup(text, 'html.parser').get_text(separator=' ')
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+def thorne_report_to_dataframe(report):
+    """
+    Flatten a Thorne Gut Health report into one row per section plus one per microbe
+
+    Args:
+        report: One report from fetch_all_thorne_reports
+
+    Returns:
+        DataFrame: Category, Microbe, Score, Risk, Summary and Insights columns
+    """
+    sections = report.get("bodySections", [])
+    # First section per anchor, so each section finds its insights in one lookup
+    anchors = {}
+    for sec in sections:
+        anchors.setdefault(sec.get("anchorId"), sec)
+
+    columns = {name: [] for name in THORNE_COLUMNS}
+    def add_row(category, microbe, score, risk, summary, insights):
+        columns['Category'].append(category)
+        columns['Microbe'].append(microbe)
+        columns['Score'].append(score)
+        columns['Risk'].append(risk)
+        columns['Summary'].append(summary)
+        columns['Insights'].append(insights)
+
+    for sec in sections:
+        results = sec.get("results") or []
+        if not results:
+            continue
+        title = sec.get("title", "")
+        insights_html = anchors.get(sec.get("anchorId", "").replace("_markers", "_insights"), {}).get("content", "").strip()
+        summary_html = pick_section_summary(results)
+
+        # Section header row, scored by its composite-like item if there is one
+        sec_title_norm = (sec.get("title") or "").strip().lower()
+        comp = next((r for r in results if is_composite_like(r, sec_title_norm)), None)
+        if comp:
+            add_row(title, "Composite", comp.get("valueNumeric", comp.get("value")), comp.get("riskClassification", ""), summary_html, insights_html)
+        else:
+            add_row(title, "", "", "", summary_html, insights_html)
+
+        # Child microbes
+        for it in results:
+            if comp is not None and it is comp:
+                continue
+            name = (it.get("title") or it.get("name") or "").strip()
+            if not name:
+                continue
+            add_row(title, name, it.get("valueNumeric", it.get("value")), it.get("riskClassification", ""), None, "")
+
+    df = pd.DataFrame(columns)
+    if df['Risk'].dtype == 'object':
+        df['Risk'] = df['Risk'].str.title()
+
+    # Deduplicate Insights: only keep the first non-empty per Category
+    first_insight = df['Insights'].ne('').groupby(df['Category']).cumsum() <= 1
+    df['Insights'] = df['Insights'].where(first_insight, '')
+
+    for col in ['Insights', 'Summary']:
+        df[col] = [clean_text(text) for text in df[col]]
+
+    # Clear Summary for non-summary categories
+    df.loc[~df['Category'].isin(THORNE_SUMMARY_CATEGORIES), 'Summary'] = ''
+    return df